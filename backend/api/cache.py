@@ -0,0 +1,159 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+CACHE_PREFIX = 'foodgram'
+CACHE_TIMEOUT = 60 * 60 * 24
+CHANGE_LOG_LIMIT = 1000
+# Бэкенды с атомарным incr: у остальных (FileBasedCache, DatabaseCache)
+# incr — это get и set, и два процесса могут получить одну версию.
+# LocMemCache атомарен внутри процесса, а другим процессам не виден.
+ATOMIC_INCR_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.redis.RedisCache',
+    'django.core.cache.backends.memcached.PyMemcacheCache',
+    'django.core.cache.backends.memcached.PyLibMCCache',
+)
+
+
+def version_key(table):
+    return f'{CACHE_PREFIX}:version:{table}'
+
+
+def get_table_version(table):
+    """
+    Возвращает текущую версию таблицы. Начальное значение берётся
+    из времени, чтобы после вытеснения ключа не совпасть со старой версией.
+    """
+    return cache.get_or_set(
+        version_key(table), lambda: time.time_ns(), timeout=None
+    )
+
+
+def change_key(table, version):
+    return f'{CACHE_PREFIX}:changes:{table}:{version}'
+
+
+def has_atomic_incr():
+    return settings.CACHES['default']['BACKEND'] in ATOMIC_INCR_BACKENDS
+
+
+def bump_table_version(table, changed_ids=None):
+    """
+    Увеличивает версию таблицы. changed_ids, если переданы, пишутся
+    в журнал изменений под новой версией, чтобы индексы в памяти
+    обновили только эти строки. Журнал ведётся только при атомарном
+    incr; иначе версия получает новое значение по времени, и индексы
+    перестраиваются целиком.
+    """
+    if not has_atomic_incr():
+        cache.set(version_key(table), time.time_ns(), timeout=None)
+        return
+    try:
+        version = cache.incr(version_key(table))
+    except ValueError:
+        cache.set(version_key(table), time.time_ns(), timeout=None)
+        return
+    if changed_ids is not None:
+        cache.set(change_key(table, version), list(changed_ids), CACHE_TIMEOUT)
+
+
+def flush_table_bumps():
+    pending = getattr(connection, 'table_bumps_pending', None)
+    if not pending:
+        return
+    connection.table_bumps_pending = None
+    for table, changed_ids in pending.items():
+        bump_table_version(table, changed_ids)
+
+
+def schedule_table_bump(table, changed_ids=None):
+    """
+    Увеличивает версию таблицы после фиксации транзакции, один раз
+    на все изменения транзакции. Без changed_ids журнал не ведётся
+    и индексы перестраиваются целиком.
+    """
+    pending = getattr(connection, 'table_bumps_pending', None)
+    if pending is None:
+        pending = connection.table_bumps_pending = {}
+    if changed_ids is None or (table in pending and pending[table] is None):
+        pending[table] = None
+    else:
+        pending.setdefault(table, set()).update(changed_ids)
+    transaction.on_commit(flush_table_bumps)
+
+
+def get_table_changes(table, since, version):
+    """
+    Возвращает id, изменённые после версии since до version включительно,
+    или None, если журнал неполон и таблицу нужно перечитать целиком.
+    """
+    if since is None or not 0 < version - since <= CHANGE_LOG_LIMIT:
+        return None
+    keys = [
+        change_key(table, number) for number in range(since + 1, version + 1)
+    ]
+    changes = cache.get_many(keys)
+    if len(changes) != len(keys):
+        return None
+    return set().union(*changes.values())
+
+
+def recipe_key(recipe_id, version):
+    return f'{CACHE_PREFIX}:recipe:{recipe_id}:{version}'
+
+
+def bump_recipe_versions(recipes):
+    """
+    Меняет cache_version рецептов из queryset recipes, после чего
+    их закешированные представления больше не читаются.
+    """
+    recipes.update(cache_version=time.time_ns())
+
+
+class VersionedCacheMixin:
+    """
+    Кеширует готовый JSON ответов list/retrieve по версии таблицы
+    и отвечает 304 на совпавший If-None-Match.
+    """
+    cache_table = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cache_key(self, request):
+        path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+        version = get_table_version(self.cache_table)
+        return f'{CACHE_PREFIX}:response:{self.cache_table}:{version}:{path}'
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        if not isinstance(request.accepted_renderer, JSONRenderer):
+            return handler(request, *args, **kwargs)
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            content = JSONRenderer().render(response.data)
+            etag = f'"{hashlib.sha256(content).hexdigest()}"'
+            cache.set(key, (etag, content), CACHE_TIMEOUT)
+        else:
+            etag, content = cached
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return response
@@ -0,0 +1,173 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from api.cache import CACHE_TIMEOUT, recipe_key
+from api.images import get_thumbnail_urls
+from api.utils import SubscriptionLoader
+from foodgram.models import IngredientRecipe, Recipe, TagRecipe
+
+image_field = Recipe._meta.get_field('image')
+
+
+class FastRecipeSerializer:
+    """
+    Собирает тот же JSON, что RecipeSerializer, из строк .values()
+    без объектов полей DRF. Не зависящая от пользователя часть рецепта
+    хранится в кеше по id и cache_version; флаги пользователя и счётчики
+    берутся из строки. RecipeSerializer остаётся эталоном, совпадение
+    проверяют тесты api.tests.test_fast_serializer.
+    """
+    values_fields = (
+        'id', 'cache_version', 'author_id', 'favorites_count',
+        'in_carts_count', 'is_favorited', 'is_in_shopping_cart',
+        'author__profile__recipes_count', 'author__profile__followers_count',
+    )
+    document_fields = (
+        'id', 'name', 'image', 'text', 'cooking_time', 'author_id',
+        'author__email', 'author__username', 'author__first_name',
+        'author__last_name',
+    )
+
+    def __init__(self, rows, context):
+        self.rows = list(rows)
+        self.context = context
+
+    def load_tags(self, recipe_ids):
+        tags = defaultdict(list)
+        cache = {}
+        for recipe_id, tag_id, name, color, slug in TagRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('tag_id').values_list(
+            'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug'
+        ):
+            tag = cache.get(tag_id)
+            if tag is None:
+                tag = cache[tag_id] = {
+                    'id': tag_id, 'name': name, 'color': color, 'slug': slug,
+                }
+            tags[recipe_id].append(tag)
+        return tags
+
+    def load_ingredients(self, recipe_ids):
+        ingredients = defaultdict(list)
+        for (recipe_id, ingredient_id, name, measurement_unit,
+             amount) in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by('id').values_list(
+            'recipe_id', 'ingredient_id', 'ingredient__name',
+            'ingredient__measurement_unit', 'amount'
+        ):
+            ingredients[recipe_id].append({
+                'id': ingredient_id,
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+        return ingredients
+
+    @staticmethod
+    def get_image(name):
+        if not name:
+            return None, {}
+        image = image_field.attr_class(None, image_field, name)
+        return image.url, get_thumbnail_urls(image)
+
+    def load_documents(self, recipe_ids):
+        """
+        Строит не зависящую от пользователя часть рецептов recipe_ids
+        тремя запросами. Ссылки на картинки хранятся относительными.
+        """
+        tags = self.load_tags(recipe_ids)
+        ingredients = self.load_ingredients(recipe_ids)
+        documents = {}
+        for row in Recipe.objects.filter(id__in=recipe_ids).order_by(
+        ).values(*self.document_fields):
+            image, thumbnails = self.get_image(row['image'])
+            documents[row['id']] = {
+                'tags': tags[row['id']],
+                'author': {
+                    'email': row['author__email'],
+                    'id': row['author_id'],
+                    'username': row['author__username'],
+                    'first_name': row['author__first_name'],
+                    'last_name': row['author__last_name'],
+                },
+                'ingredients': ingredients[row['id']],
+                'name': row['name'],
+                'image': image,
+                'thumbnails': thumbnails,
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+            }
+        return documents
+
+    def get_documents(self):
+        """
+        Читает документы страницы одним get_many и дописывает в кеш
+        только отсутствующие.
+        """
+        keys = {
+            row['id']: recipe_key(row['id'], row['cache_version'])
+            for row in self.rows
+        }
+        cached = cache.get_many(keys.values())
+        documents = {
+            recipe_id: cached[key]
+            for recipe_id, key in keys.items() if key in cached
+        }
+        missing = [
+            recipe_id for recipe_id in keys if recipe_id not in documents
+        ]
+        if missing:
+            loaded = self.load_documents(missing)
+            cache.set_many(
+                {keys[recipe_id]: document
+                 for recipe_id, document in loaded.items()},
+                CACHE_TIMEOUT
+            )
+            documents.update(loaded)
+        return documents
+
+    @property
+    def data(self):
+        documents = self.get_documents()
+        request = self.context.get('request')
+        absolute = request.build_absolute_uri if request else str
+        subscriptions = self.context.get('subscriptions')
+        if subscriptions is None:
+            subscriptions = SubscriptionLoader(request.user)
+        data = []
+        for row in self.rows:
+            document = documents.get(row['id'])
+            if document is None:
+                continue
+            image = document['image']
+            data.append({
+                'id': row['id'],
+                'tags': document['tags'],
+                'author': {
+                    **document['author'],
+                    'is_subscribed': subscriptions.is_subscribed(
+                        row['author_id']
+                    ),
+                    'recipes_count': row['author__profile__recipes_count'],
+                    'followers_count': row[
+                        'author__profile__followers_count'
+                    ],
+                },
+                'ingredients': document['ingredients'],
+                'is_favorited': row['is_favorited'],
+                'is_in_shopping_cart': row['is_in_shopping_cart'],
+                'name': document['name'],
+                'image': absolute(image) if image else None,
+                'thumbnails': {
+                    size: absolute(url)
+                    for size, url in document['thumbnails'].items()
+                },
+                'text': document['text'],
+                'cooking_time': document['cooking_time'],
+                'favorites_count': row['favorites_count'],
+                'in_carts_count': row['in_carts_count'],
+            })
+        return data
@@ -1,9 +1,9 @@
-import base64
 import webcolors
 
-from django.core.files.base import ContentFile
 from rest_framework import serializers
 
+from api.images import decode_base64_image
+
 
 class Name2HexColor(serializers.Field):
     def to_representation(self, value):
@@ -26,7 +26,5 @@ class Name2HexColor(serializers.Field):
 class Base64ImageField(serializers.ImageField):
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = decode_base64_image(data)
         return super().to_internal_value(data)
@@ -1,33 +1,47 @@
+from django.db.models import Exists, OuterRef
 from django_filters.rest_framework import (
     BooleanFilter, FilterSet, ModelMultipleChoiceFilter
 )
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import SearchFilter
 
-from foodgram.models import Recipe, Tag
+from api.ingredient_index import ingredient_index
+from foodgram.models import (Cart, Favorite, Ingredient, Recipe, Tag,
+                             TagRecipe)
 
 
 class CustomRecipeFilter(FilterSet):
-    is_favorited = BooleanFilter(
-        field_name='favorited__user',
-        method='favorited_or_in_cart'
-    )
-    is_in_shopping_cart = BooleanFilter(
-        field_name='in_cart__user',
-        method='favorited_or_in_cart'
-    )
+    """
+    Фильтры по тегам и флагам построены на подзапросах EXISTS,
+    поэтому не размножают строки рецептов и не требуют DISTINCT.
+    """
+    is_favorited = BooleanFilter(method='filter_flag')
+    is_in_shopping_cart = BooleanFilter(method='filter_flag')
     tags = ModelMultipleChoiceFilter(
-        field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
     )
 
-    def favorited_or_in_cart(self, queryset, name, value):
+    flag_models = {
+        'is_favorited': Favorite,
+        'is_in_shopping_cart': Cart,
+    }
+
+    def filter_flag(self, queryset, name, value):
         if not self.request.user.is_authenticated:
             return queryset
-        user = self.request.user
-        if value:
-            return queryset.filter(**{name: user})
-        return queryset.exclude(**{name: user})
+        exists = Exists(self.flag_models[name].objects.filter(
+            user=self.request.user, recipe=OuterRef('pk')
+        ))
+        return queryset.filter(exists if value else ~exists)
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        return queryset.filter(Exists(TagRecipe.objects.filter(
+            recipe=OuterRef('pk'), tag__in=value
+        )))
 
     class Meta:
         model = Recipe
@@ -36,3 +50,31 @@ class CustomRecipeFilter(FilterSet):
 
 class CustomIngredientFilter(SearchFilter):
     search_param = 'name'
+    limit_param = 'limit'
+
+    def get_limit(self, request):
+        limit = request.query_params.get(self.limit_param)
+        if limit is None:
+            return None
+        try:
+            limit = int(limit)
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            raise ValidationError(
+                {self.limit_param: 'Укажите целое положительное число!'}
+            )
+        return limit
+
+    def filter_queryset(self, request, queryset, view):
+        if getattr(view, 'action', None) != 'list':
+            return super().filter_queryset(request, queryset, view)
+        name = request.query_params.get(self.search_param, '').strip()
+        limit = self.get_limit(request)
+        if not name:
+            return queryset[:limit]
+        return [
+            Ingredient(id=id, name=name, measurement_unit=measurement_unit)
+            for id, name, measurement_unit
+            in ingredient_index.search(name, limit)
+        ]
@@ -0,0 +1,181 @@
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from rest_framework import serializers
+
+from api.cache import bump_recipe_versions
+from foodgram.models import Recipe
+
+logger = logging.getLogger(__name__)
+
+config = settings.IMAGE_PIPELINE
+recipe_storage = Recipe._meta.get_field('image').storage
+executor = ThreadPoolExecutor(
+    max_workers=config['WORKERS'], thread_name_prefix='image-pipeline'
+)
+
+
+def decode_base64_image(data):
+    """
+    Декодирует строку data:image/...;base64 с ограничением размера
+    и называет файл по хешу содержимого.
+    """
+    try:
+        header, imgstr = data.split(';base64,')
+    except ValueError:
+        raise serializers.ValidationError('Некорректная строка base64!')
+    if len(imgstr) * 3 // 4 > config['MAX_UPLOAD_BYTES']:
+        raise serializers.ValidationError(
+            'Размер картинки не должен превышать '
+            f'{config["MAX_UPLOAD_BYTES"] // (1024 * 1024)} МБ!'
+        )
+    try:
+        content = base64.b64decode(imgstr, validate=True)
+    except binascii.Error:
+        raise serializers.ValidationError('Некорректная строка base64!')
+    try:
+        with Image.open(io.BytesIO(content)) as image:
+            width, height = image.size
+            ext = image.format.lower()
+    except (UnidentifiedImageError, OSError):
+        raise serializers.ValidationError('Файл не является картинкой!')
+    if width * height > config['MAX_PIXELS']:
+        raise serializers.ValidationError('Слишком большое разрешение!')
+    name = f'{hashlib.sha256(content).hexdigest()}.{ext}'
+    return ContentFile(content, name=name)
+
+
+def thumbnail_name(name, size):
+    stem, ext = os.path.splitext(name)
+    directory, filename = os.path.split(stem)
+    return os.path.join(directory, 'thumbnails', f'{filename}_{size}{ext}')
+
+
+def get_thumbnail_urls(image, request=None):
+    """
+    Возвращает ссылки на превью; пока превью не готово — на оригинал.
+    """
+    if not image:
+        return {}
+    urls = {}
+    for size in config['THUMBNAIL_SIZES']:
+        name = thumbnail_name(image.name, size)
+        url = (
+            default_storage.url(name) if default_storage.exists(name)
+            else image.url
+        )
+        urls[size] = request.build_absolute_uri(url) if request else url
+    return urls
+
+
+def encode_image(image, image_format):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def is_recent(storage, name):
+    """
+    Файл моложе GC_GRACE_SECONDS может принадлежать рецепту
+    из ещё не зафиксированной транзакции.
+    """
+    deadline = timezone.now() - timezone.timedelta(
+        seconds=config['GC_GRACE_SECONDS']
+    )
+    return storage.get_modified_time(name) > deadline
+
+
+def release_image(name):
+    """
+    Удаляет картинку и её превью, если на неё не ссылается ни один рецепт
+    и её не загружали повторно в последние GC_GRACE_SECONDS. Проверка
+    и удаление идут под блокировкой хранилища, поэтому файл, который
+    в это время переиспользует загрузка, не удаляется.
+    """
+    if not name:
+        return
+    with recipe_storage.lock():
+        if Recipe.objects.filter(image=name).exists():
+            return
+        if recipe_storage.exists(name) and is_recent(recipe_storage, name):
+            return
+        recipe_storage.delete(name)
+        for size in config['THUMBNAIL_SIZES']:
+            default_storage.delete(thumbnail_name(name, size))
+
+
+def process_image(name):
+    """
+    Уменьшает оригинал до MAX_SIDE и создаёт недостающие превью.
+    Уменьшенная копия сохраняется под именем оригинала с суффиксом,
+    рецепты переключаются на неё, а повторная загрузка того же оригинала
+    получит её без новой обработки. Закешированные рецепты с этой картинкой
+    сбрасываются, чтобы ссылки на превью сменились с оригинала.
+    """
+    changed = False
+    try:
+        with recipe_storage.open(name) as image_file:
+            image = Image.open(image_file)
+            image.load()
+        image_format = image.format
+        if max(image.size) > config['MAX_SIDE']:
+            image.thumbnail((config['MAX_SIDE'], config['MAX_SIDE']))
+            new_name = recipe_storage.save_scaled(
+                name, encode_image(image, image_format)
+            )
+            if new_name != name:
+                Recipe.objects.filter(image=name).update(image=new_name)
+                release_image(name)
+                name = new_name
+                changed = True
+        for size, side in config['THUMBNAIL_SIZES'].items():
+            thumbnail_path = thumbnail_name(name, size)
+            if default_storage.exists(thumbnail_path):
+                continue
+            thumbnail = image.copy()
+            thumbnail.thumbnail((side, side))
+            default_storage.save(
+                thumbnail_path, encode_image(thumbnail, image_format)
+            )
+            changed = True
+    except Exception:
+        logger.exception('Не удалось обработать картинку %s', name)
+    if changed:
+        bump_recipe_versions(Recipe.objects.filter(image=name))
+
+
+def process_image_in_worker(name):
+    """
+    Обрабатывает картинку в потоке пула. Соединение с базой у потока
+    своё и живёт между задачами, поэтому устаревшее или оборванное
+    соединение закрывается до и после задачи, как в начале и конце
+    запроса.
+    """
+    close_old_connections()
+    try:
+        process_image(name)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_processing(name):
+    """
+    Ставит обработку картинки в пул после фиксации транзакции.
+    """
+    if config['ASYNC']:
+        transaction.on_commit(
+            lambda: executor.submit(process_image_in_worker, name)
+        )
+    else:
+        transaction.on_commit(lambda: process_image(name))
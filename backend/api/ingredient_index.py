@@ -0,0 +1,78 @@
+import logging
+import threading
+from bisect import bisect_left
+from heapq import nsmallest
+
+from django.db import DatabaseError
+
+from api.cache import get_table_version
+from foodgram.models import Ingredient
+
+logger = logging.getLogger(__name__)
+
+
+class IngredientPrefixIndex:
+    """
+    Отсортированный по названию массив ингредиентов в памяти процесса.
+    Перестраивается, когда меняется версия таблицы ингредиентов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = ([], [])
+
+    def build(self, version=None):
+        rows = sorted(
+            (name.casefold(), id, name, measurement_unit)
+            for id, name, measurement_unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit'
+            )
+        )
+        keys = [row[0] for row in rows]
+        items = [row[1:] for row in rows]
+        with self._lock:
+            self._data = (keys, items)
+            self._version = version
+
+    def ensure_fresh(self):
+        version = get_table_version('ingredient')
+        if version != self._version:
+            self.build(version)
+
+    def warm_up(self):
+        """
+        Строит индекс при старте воркера, чтобы первый запрос
+        автодополнения не ждал построения. Без базы индекс построится
+        при первом поиске.
+        """
+        try:
+            self.ensure_fresh()
+        except DatabaseError:
+            logger.warning(
+                'Индекс ингредиентов не построен при старте', exc_info=True
+            )
+
+    def search(self, prefix, limit=None):
+        """
+        Возвращает (id, name, measurement_unit) ингредиентов с названием,
+        начинающимся с prefix: сначала точные и более короткие совпадения.
+        """
+        self.ensure_fresh()
+        prefix = prefix.casefold()
+        keys, items = self._data
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + '\U0010ffff', lo=start)
+        matches = range(start, end)
+
+        def rank(position):
+            return len(keys[position]), keys[position]
+
+        if limit is None:
+            positions = sorted(matches, key=rank)
+        else:
+            positions = nsmallest(limit, matches, key=rank)
+        return [items[position] for position in positions]
+
+
+ingredient_index = IngredientPrefixIndex()
@@ -0,0 +1,97 @@
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.sql')
+
+
+class QueryStats:
+    """
+    Обёртка для connection.execute_wrapper: считает запросы,
+    их суммарное время и повторы одинакового SQL.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        return sum(count - 1 for count in self.statements.values())
+
+    def repeated(self, threshold):
+        return [
+            (sql, count) for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Добавляет к ответу заголовок Server-Timing с числом и временем
+    SQL-запросов и пишет по каждому запросу строку лога в JSON.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = settings.SQL_INSTRUMENTATION
+        self.sample_rate = config['SAMPLE_RATE']
+        self.slow_request_ms = config['SLOW_REQUEST_MS']
+        self.n_plus_one_threshold = config['N_PLUS_ONE_THRESHOLD']
+
+    def __call__(self, request):
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return self.get_response(request)
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+        db_ms = stats.duration * 1000
+        response['Server-Timing'] = (
+            f'db;dur={db_ms:.1f};desc="{stats.count} queries", '
+            f'app;dur={total_ms - db_ms:.1f}, total;dur={total_ms:.1f}'
+        )
+        repeated = stats.repeated(self.n_plus_one_threshold)
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': stats.count,
+            'duplicates': stats.duplicates,
+            'db_ms': round(db_ms, 1),
+            'total_ms': round(total_ms, 1),
+            'n_plus_one': [
+                {'sql': sql, 'count': count} for sql, count in repeated
+            ],
+        }
+        logger.info(json.dumps(record, ensure_ascii=False))
+        if repeated:
+            logger.warning(
+                'Возможная проблема N+1: %s %s',
+                request.method, request.path
+            )
+        if self.slow_request_ms and total_ms >= self.slow_request_ms:
+            logger.warning(
+                'Медленный запрос %s %s: %.1f ms',
+                request.method, request.path, total_ms
+            )
+        return response
@@ -1,7 +1,140 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
     page_size = 6
     page_query_param = 'page'
     page_size_query_param = 'limit'
+
+
+class CursorPageLimitPagination(PageLimitPagination):
+    """
+    Постраничная пагинация page/limit, а при наличии параметра cursor
+    (в том числе пустого) — пагинация по ключу keyset без COUNT и OFFSET.
+    Ключ следует сортировке запроса, keyset — ключ по умолчанию.
+    """
+    cursor_query_param = 'cursor'
+    cursor_only = False
+    keyset = ('-pub_date', '-id')
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            self.cursor_only
+            or self.cursor_query_param in request.query_params
+        )
+        if not self.use_cursor:
+            return super().paginate_queryset(queryset, request, view)
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.keyset = self.get_keyset(queryset)
+        queryset = queryset.order_by(*self.keyset)
+        position = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param),
+            queryset.model
+        )
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position))
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        self.page = page[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.use_cursor:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_next_link(self):
+        if not self.use_cursor:
+            return super().get_next_link()
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        cursor = self.encode_cursor([
+            last[field.lstrip('-')] if isinstance(last, dict)
+            else getattr(last, field.lstrip('-'))
+            for field in self.keyset
+        ])
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            cursor
+        )
+
+    def get_keyset(self, queryset):
+        """
+        Берёт ключ из сортировки запроса (например, ?ordering=-popularity)
+        и дополняет его id, чтобы ключ был уникальным.
+        """
+        ordering = list(queryset.query.order_by)
+        if not ordering or not all(
+            isinstance(field, str) and '__' not in field
+            for field in ordering
+        ):
+            return self.keyset
+        if 'id' not in {field.lstrip('-') for field in ordering}:
+            ordering.append('-id' if ordering[-1].startswith('-') else 'id')
+        return tuple(ordering)
+
+    @staticmethod
+    def encode_cursor(values):
+        # DjangoJSONEncoder обрезает время до миллисекунд.
+        values = [
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ]
+        data = json.dumps(values, cls=DjangoJSONEncoder).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor, model):
+        if not cursor:
+            return None
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            values = json.loads(data)
+            if len(values) != len(self.keyset):
+                raise ValueError
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.keyset, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def keyset_filter(self, position):
+        """
+        Строит условие «строго после position» в порядке keyset.
+        """
+        condition = Q()
+        for index, field in enumerate(self.keyset):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                previous.lstrip('-'): position[number]
+                for number, previous in enumerate(self.keyset[:index])
+            }
+            condition |= Q(**equal, **{f'{name}__{lookup}': position[index]})
+        return condition
+
+
+class SubscriptionCursorPagination(CursorPageLimitPagination):
+    keyset = ('id',)
+
+
+class FeedCursorPagination(CursorPageLimitPagination):
+    cursor_only = True
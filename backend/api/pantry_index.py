@@ -0,0 +1,141 @@
+import threading
+from array import array
+from collections import Counter, defaultdict
+from heapq import nsmallest
+
+from api.cache import get_table_changes, get_table_version
+from foodgram.models import IngredientRecipe
+
+MAX_RESULTS = 1000
+TABLE = 'recipe_ingredient'
+# Доля устаревших позиций, после которой индекс перестраивается целиком.
+MAX_DEAD_SHARE = 0.2
+
+
+class PantryIndex:
+    """
+    Инвертированный индекс в памяти процесса: для каждого ингредиента —
+    массив позиций рецептов, в которых он есть. Изменённые рецепты
+    дописываются новыми позициями по журналу изменений, целиком индекс
+    перестраивается, только если журнал неполон.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = (array('I'), array('H'), {})
+        self._positions = {}
+        self._dead = 0
+
+    def build(self, version=None):
+        recipe_ids = array('I')
+        sizes = array('H')
+        positions = {}
+        postings = {}
+        for recipe_id, ingredient_id in IngredientRecipe.objects.order_by(
+        ).values_list('recipe_id', 'ingredient_id').iterator():
+            position = positions.get(recipe_id)
+            if position is None:
+                position = positions[recipe_id] = len(recipe_ids)
+                recipe_ids.append(recipe_id)
+                sizes.append(0)
+            sizes[position] += 1
+            postings.setdefault(ingredient_id, array('I')).append(position)
+        self._data = (recipe_ids, sizes, postings)
+        self._positions = positions
+        self._dead = 0
+        self._version = version
+
+    def apply_changes(self, recipe_ids, version):
+        """
+        Обновляет рецепты recipe_ids: старая позиция получает нулевой
+        размер и пропускается поиском, актуальный состав дописывается
+        в конец. Поиск идёт без блокировки, поэтому изменения пишутся
+        в копии массивов, которые подменяют прежние одним присваиванием.
+        """
+        ingredients = defaultdict(list)
+        for recipe_id, ingredient_id in IngredientRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values_list('recipe_id', 'ingredient_id'):
+            ingredients[recipe_id].append(ingredient_id)
+        old_recipe_ids, old_sizes, old_postings = self._data
+        all_recipe_ids = array('I', old_recipe_ids)
+        sizes = array('H', old_sizes)
+        postings = dict(old_postings)
+        copied = set()
+        for recipe_id in recipe_ids:
+            position = self._positions.pop(recipe_id, None)
+            if position is not None:
+                sizes[position] = 0
+                self._dead += 1
+            if not ingredients[recipe_id]:
+                continue
+            position = self._positions[recipe_id] = len(all_recipe_ids)
+            all_recipe_ids.append(recipe_id)
+            sizes.append(len(ingredients[recipe_id]))
+            for ingredient_id in ingredients[recipe_id]:
+                if ingredient_id not in copied:
+                    postings[ingredient_id] = array(
+                        'I', postings.get(ingredient_id, ())
+                    )
+                    copied.add(ingredient_id)
+                postings[ingredient_id].append(position)
+        self._data = (all_recipe_ids, sizes, postings)
+        self._version = version
+
+    def refresh(self, version):
+        changes = get_table_changes(TABLE, self._version, version)
+        if (changes is None
+                or self._dead + len(changes)
+                > MAX_DEAD_SHARE * max(len(self._positions), 1)):
+            self.build(version)
+        else:
+            self.apply_changes(changes, version)
+
+    def ensure_fresh(self):
+        """
+        Обновляет индекс до текущей версии. Обновлением занимается один
+        поток; остальные, если индекс уже построен, не ждут его и ищут
+        по предыдущей версии.
+        """
+        version = get_table_version(TABLE)
+        if version == self._version:
+            return
+        if not self._lock.acquire(blocking=self._version is None):
+            return
+        try:
+            version = get_table_version(TABLE)
+            if version != self._version:
+                self.refresh(version)
+        finally:
+            self._lock.release()
+
+    def search(self, ingredient_ids, max_missing=None, limit=MAX_RESULTS):
+        """
+        Возвращает (recipe_id, coverage, missing) рецептов, где есть хотя бы
+        один из ingredient_ids: по убыванию доли имеющихся ингредиентов,
+        затем по числу недостающих и от новых к старым.
+        """
+        self.ensure_fresh()
+        recipe_ids, sizes, postings = self._data
+        matched = Counter()
+        for ingredient_id in set(ingredient_ids):
+            matched.update(postings.get(ingredient_id, ()))
+        candidates = []
+        for position, count in matched.items():
+            size = sizes[position]
+            if not size:
+                continue
+            missing = size - count
+            if max_missing is not None and missing > max_missing:
+                continue
+            candidates.append(
+                (-count / size, missing, -recipe_ids[position])
+            )
+        return [
+            (-recipe_id, -coverage, missing)
+            for coverage, missing, recipe_id in nsmallest(limit, candidates)
+        ]
+
+
+pantry_index = PantryIndex()
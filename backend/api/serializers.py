@@ -1,19 +1,29 @@
 from django.contrib.auth.models import User
 from djoser.serializers import UserCreateSerializer, UserSerializer
-from django.shortcuts import get_object_or_404
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
+from api.cache import bump_recipe_versions, schedule_table_bump
 from api.fields import Base64ImageField, Name2HexColor
+from api.images import (get_thumbnail_urls, release_image,
+                        schedule_image_processing)
 from api.utils import (
     get_is_in_shopping_cart,
     get_is_favorited,
-    get_is_subscribed
+    get_is_subscribed,
+    get_recipes_limit,
 )
+from foodgram.cart_totals import schedule_cart_refresh
+from foodgram.popularity import popularity_score
+from foodgram.search import schedule_search_update
 from foodgram.models import (
     Follow,
     Ingredient,
     IngredientRecipe,
+    Profile,
     Recipe,
     Tag,
     TagRecipe,
@@ -34,11 +44,16 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
 
 class CustomerUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField(read_only=True)
+    recipes_count = serializers.ReadOnlyField(source='profile.recipes_count')
+    followers_count = serializers.ReadOnlyField(
+        source='profile.followers_count'
+    )
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name',
-                  'last_name', 'is_subscribed', )
+                  'last_name', 'is_subscribed', 'recipes_count',
+                  'followers_count', )
 
     def get_is_subscribed(self, obj):
         return get_is_subscribed(self, obj)
@@ -63,15 +78,6 @@ class AddIngredientSerializer(serializers.ModelSerializer):
         model = IngredientRecipe
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
-    def validate_id(self, value):
-        try:
-            get_object_or_404(Ingredient, id=value)
-        except Exception:
-            raise serializers.ValidationError(
-                'Похоже, такого ингредиента не существует!'
-            )
-        return value
-
 
 class TagSerializer(serializers.ModelSerializer):
     color = Name2HexColor()
@@ -91,13 +97,16 @@ class RecipeSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField(read_only=True)
     is_in_shopping_cart = serializers.SerializerMethodField(read_only=True)
+    thumbnails = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
         fields = (
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
-            'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
+            'is_in_shopping_cart', 'name', 'image', 'thumbnails', 'text',
+            'cooking_time', 'favorites_count', 'in_carts_count',
         )
+        read_only_fields = ('favorites_count', 'in_carts_count')
 
     def get_is_favorited(self, obj):
         return get_is_favorited(self, obj)
@@ -105,6 +114,9 @@ class RecipeSerializer(serializers.ModelSerializer):
     def get_is_in_shopping_cart(self, obj):
         return get_is_in_shopping_cart(self, obj)
 
+    def get_thumbnails(self, obj):
+        return get_thumbnail_urls(obj.image, self.context.get('request'))
+
 
 class RecipePostSerializer(serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
@@ -129,6 +141,23 @@ class RecipePostSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time',
         )
 
+    def validate_ingredients(self, value):
+        """
+        Загружает все ингредиенты одним запросом и подставляет
+        найденные объекты вместо id.
+        """
+        ids = [element['ingredient']['id'] for element in value]
+        ingredients = Ingredient.objects.in_bulk(ids)
+        missing = sorted(set(ids) - ingredients.keys())
+        if missing:
+            raise serializers.ValidationError(
+                'Похоже, таких ингредиентов не существует: '
+                f'{", ".join(map(str, missing))}!'
+            )
+        for element in value:
+            element['ingredient'] = ingredients[element['ingredient']['id']]
+        return value
+
     def validate(self, data):
         ingredients = data.get('ingredient_recipes')
         if ingredients == []:
@@ -138,7 +167,7 @@ class RecipePostSerializer(serializers.ModelSerializer):
         if ingredients:
             ingredients_list = []
             for element in ingredients:
-                ingredients_list.append(element['ingredient'].get('id'))
+                ingredients_list.append(element['ingredient'].id)
             if len(ingredients) != len(set(ingredients_list)):
                 raise serializers.ValidationError('Ингредиенты не уникальны!')
             return data
@@ -160,20 +189,20 @@ class RecipePostSerializer(serializers.ModelSerializer):
         return get_is_in_shopping_cart(self, obj)
 
     def to_representation(self, instance):
-        request = self.context.get('request')
-        serializer = RecipeSerializer(instance, context={'request': request})
+        prefetch_related_objects(
+            [instance], 'tags', 'ingredient_recipes__ingredient'
+        )
+        serializer = RecipeSerializer(instance, context=self.context)
         return serializer.data
 
     @staticmethod
     def insert_ingredients(ingredient_list, recipe):
         objects = []
         for ingredient in ingredient_list:
-            ingredient_id = ingredient['ingredient']['id']
-            amount = ingredient['amount']
             item = IngredientRecipe(
-                ingredient_id=ingredient_id,
+                ingredient=ingredient['ingredient'],
                 recipe=recipe,
-                amount=amount)
+                amount=ingredient['amount'])
             objects.append(item)
         IngredientRecipe.objects.bulk_create(objects)
 
@@ -184,29 +213,114 @@ class RecipePostSerializer(serializers.ModelSerializer):
             objects.append(TagRecipe(tag_id=tag.id, recipe=recipe))
         TagRecipe.objects.bulk_create(objects)
 
+    @transaction.atomic
     def create(self, validated_data):
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredient_recipes')
-        recipe = Recipe.objects.create(**validated_data)
+        recipe = Recipe.objects.create(
+            **validated_data, popularity=popularity_score(timezone.now())
+        )
         self.insert_tags(tags, recipe)
         self.insert_ingredients(ingredients, recipe)
+        schedule_image_processing(recipe.image.name)
         return recipe
 
-    def update(self, instance, validated_data):
-        if validated_data.get('ingredient_recipes'):
-            instance.ingredients.clear()
-            self.insert_ingredients(
-                validated_data.pop('ingredient_recipes'),
-                instance
+    @staticmethod
+    def sync_ingredients(ingredient_list, recipe):
+        """
+        Приводит ингредиенты рецепта к ingredient_list, меняя только
+        отличающиеся строки. Возвращает id затронутых ингредиентов
+        и число удалённых, добавленных и изменённых строк.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in recipe.ingredient_recipes.all()
+        }
+        wanted = {
+            ingredient['ingredient'].id: ingredient
+            for ingredient in ingredient_list
+        }
+        removed = current.keys() - wanted.keys()
+        created = [
+            IngredientRecipe(
+                ingredient=wanted[ingredient_id]['ingredient'],
+                recipe=recipe,
+                amount=wanted[ingredient_id]['amount']
             )
-        else:
+            for ingredient_id in wanted.keys() - current.keys()
+        ]
+        changed = []
+        for ingredient_id, item in current.items():
+            if ingredient_id not in wanted:
+                continue
+            amount = wanted[ingredient_id]['amount']
+            if item.amount != amount:
+                item.amount = amount
+                changed.append(item)
+        if removed:
+            IngredientRecipe.objects.filter(
+                recipe=recipe, ingredient_id__in=removed
+            ).delete()
+        IngredientRecipe.objects.bulk_create(created)
+        IngredientRecipe.objects.bulk_update(changed, ['amount'])
+        touched = removed | {item.ingredient_id for item in created + changed}
+        return touched, len(removed), len(created), len(changed)
+
+    @staticmethod
+    def sync_tags(tag_list, recipe):
+        """
+        Удаляет снятые теги и добавляет новые.
+        Возвращает число удалённых и добавленных строк.
+        """
+        current = {tag.id for tag in recipe.tags.all()}
+        wanted = {tag.id for tag in tag_list}
+        removed = current - wanted
+        if removed:
+            TagRecipe.objects.filter(
+                recipe=recipe, tag_id__in=removed
+            ).delete()
+        TagRecipe.objects.bulk_create(
+            [TagRecipe(tag_id=tag_id, recipe=recipe)
+             for tag_id in wanted - current]
+        )
+        return len(removed), len(wanted - current)
+
+    @transaction.atomic
+    def update(self, instance, validated_data):
+        if not validated_data.get('ingredient_recipes'):
             raise serializers.ValidationError('Ингредиенты не указаны!')
-        if validated_data.get('tags'):
-            instance.tags.clear()
-            self.insert_tags(validated_data.pop('tags'), instance)
-        else:
+        if not validated_data.get('tags'):
             raise serializers.ValidationError('Теги не указаны!')
-        return super().update(instance, validated_data)
+        touched, *ingredient_rows = self.sync_ingredients(
+            validated_data.pop('ingredient_recipes'), instance
+        )
+        tag_rows = self.sync_tags(validated_data.pop('tags'), instance)
+        # Сколько строк связей записано: тесты проверяют по нему,
+        # что правка не переписывает неизменившиеся строки.
+        self.rows_touched = dict(zip(
+            ('ingredients_deleted', 'ingredients_created',
+             'ingredients_updated', 'tags_deleted', 'tags_created'),
+            (*ingredient_rows, *tag_rows)
+        ))
+        if touched:
+            schedule_cart_refresh(recipe_ingredients={instance.id: touched})
+            # bulk_create и bulk_update не отправляют сигналов, а рецепт
+            # без изменённых полей не сохраняется.
+            schedule_table_bump('recipe_ingredient', [instance.id])
+            schedule_search_update([instance.id])
+        old_image = instance.image.name
+        for field, value in validated_data.items():
+            setattr(instance, field, value)
+        if validated_data:
+            # Только присланные поля: полное сохранение затёрло бы счётчики,
+            # изменённые параллельными запросами после загрузки рецепта.
+            instance.save(update_fields=list(validated_data))
+        else:
+            bump_recipe_versions(Recipe.objects.filter(id=instance.id))
+        if instance.image.name != old_image:
+            schedule_image_processing(instance.image.name)
+            transaction.on_commit(lambda: release_image(old_image))
+        return instance
 
 
 class CustomUserCreateSerializer(UserCreateSerializer):
@@ -225,10 +339,22 @@ class CustomUserCreateSerializer(UserCreateSerializer):
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    thumbnails = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'thumbnails', 'cooking_time')
+
+    def get_thumbnails(self, obj):
+        return get_thumbnail_urls(obj.image, self.context.get('request'))
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=100,
+    )
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -250,13 +376,18 @@ class FollowSerializer(serializers.ModelSerializer):
         return get_is_subscribed(self, obj)
 
     def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author.id).count()
+        try:
+            return obj.author.profile.recipes_count
+        except Profile.DoesNotExist:
+            return Recipe.objects.filter(author=obj.author.id).count()
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes_limit = request.GET.get('recipes_limit')
-        recipes = Recipe.objects.filter(author=obj.author)
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        if hasattr(obj.author, 'recipe_previews'):
+            recipes = obj.author.recipe_previews
+        else:
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            recipes = Recipe.objects.filter(
+                author=obj.author
+            )[:recipes_limit]
         serializer = ShortRecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
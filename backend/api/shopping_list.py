@@ -0,0 +1,94 @@
+import csv
+import os
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics, ttfonts
+from reportlab.pdfgen import canvas
+
+FONT_NAME = 'arial'
+FONT_PATH = os.path.join(settings.BASE_DIR, 'fonts', 'arial.ttf')
+FONT_SIZE = 12
+TITLE = 'Список покупок'
+TITLE_X = 200
+TEXT_X = 100
+LINE_HEIGHT = 25
+MARGIN = 50
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+CSV_HEADER = ('name', 'measurement_unit', 'total_amount')
+
+
+def register_fonts():
+    """
+    Регистрирует шрифт для PDF. Вызывается один раз при старте приложения.
+    """
+    if FONT_NAME not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(ttfonts.TTFont(FONT_NAME, FONT_PATH))
+
+
+def format_line(element):
+    return (f'• {element["name"]} '
+            f'({element["measurement_unit"]}) — '
+            f'{element["total_amount"]}')
+
+
+def render_pdf(ingredients):
+    """
+    Рисует список покупок постранично во временный файл
+    и отдаёт его частями по CHUNK_SIZE байт.
+    """
+    register_fonts()
+    width, height = A4
+    with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as buffer:
+        pdf = canvas.Canvas(buffer, pagesize=A4)
+        pdf.setFont(FONT_NAME, FONT_SIZE)
+        pdf.drawString(TITLE_X, height - MARGIN, TITLE)
+        y = height - MARGIN - LINE_HEIGHT
+        for element in ingredients:
+            if y < MARGIN:
+                pdf.showPage()
+                pdf.setFont(FONT_NAME, FONT_SIZE)
+                y = height - MARGIN
+            pdf.drawString(TEXT_X, y, format_line(element))
+            y -= LINE_HEIGHT
+        pdf.showPage()
+        pdf.save()
+        buffer.seek(0)
+        while True:
+            chunk = buffer.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+
+
+def render_txt(ingredients):
+    yield f'{TITLE}\n\n'.encode()
+    for element in ingredients:
+        yield f'{format_line(element)}\n'.encode()
+
+
+class Echo:
+    """
+    Псевдобуфер для csv.writer: возвращает записанную строку.
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_HEADER).encode()
+    for element in ingredients:
+        yield writer.writerow(
+            [element[field] for field in CSV_HEADER]
+        ).encode()
+
+
+RENDERERS = {
+    'pdf': (render_pdf, 'application/pdf'),
+    'txt': (render_txt, 'text/plain; charset=utf-8'),
+    'csv': (render_csv, 'text/csv; charset=utf-8'),
+}
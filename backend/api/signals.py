@@ -0,0 +1,172 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from api.cache import bump_recipe_versions, schedule_table_bump
+from api.images import release_image
+from foodgram.cart_totals import schedule_cart_refresh
+from foodgram.counters import change_counter, get_target_id
+from foodgram.models import (Cart, Favorite, Follow, Ingredient,
+                             IngredientRecipe, Profile, Recipe, Tag,
+                             TagRecipe)
+from foodgram.search import schedule_search_update
+
+User = get_user_model()
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tag_version(sender, **kwargs):
+    schedule_table_bump('tag')
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredient_version(sender, **kwargs):
+    schedule_table_bump('ingredient')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def bump_recipe_ingredient_version(sender, instance, **kwargs):
+    schedule_table_bump('recipe_ingredient', [
+        instance.id if sender is Recipe else instance.recipe_id
+    ])
+
+
+@receiver(post_delete, sender=Ingredient)
+def reset_recipe_ingredient_version(sender, **kwargs):
+    schedule_table_bump('recipe_ingredient')
+
+
+@receiver(post_save, sender=Ingredient)
+def reindex_ingredient_recipes(sender, instance, created, raw=False,
+                               **kwargs):
+    if not created and not raw:
+        schedule_search_update(IngredientRecipe.objects.filter(
+            ingredient=instance
+        ).values_list('recipe_id', flat=True))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def reindex_recipe(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_search_update([
+            instance.id if sender is Recipe else instance.recipe_id
+        ])
+
+
+@receiver(post_save, sender=Recipe)
+def bump_recipe_version(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_recipe_versions(Recipe.objects.filter(id=instance.id))
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_save, sender=TagRecipe)
+def bump_linked_recipe_version(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_recipe_versions(Recipe.objects.filter(id=instance.recipe_id))
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def bump_ingredient_recipes_version(sender, instance, created=False,
+                                    raw=False, **kwargs):
+    if not created and not raw:
+        bump_recipe_versions(Recipe.objects.filter(
+            ingredient_recipes__ingredient=instance
+        ))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def bump_tag_recipes_version(sender, instance, created=False, raw=False,
+                             **kwargs):
+    if not created and not raw:
+        bump_recipe_versions(Recipe.objects.filter(tags=instance))
+
+
+@receiver(post_save, sender=User)
+def bump_author_recipes_version(sender, instance, created, raw=False,
+                                update_fields=None, **kwargs):
+    """
+    Данные автора входят в закешированные рецепты; сохранение
+    только last_login и других полей их не трогает.
+    """
+    if created or raw:
+        return
+    if update_fields is None or AUTHOR_FIELDS & set(update_fields):
+        bump_recipe_versions(Recipe.objects.filter(author=instance))
+
+
+@receiver(post_delete, sender=Recipe)
+def release_recipe_image(sender, instance, **kwargs):
+    name = instance.image.name
+    transaction.on_commit(lambda: release_image(name))
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Cart)
+@receiver(post_save, sender=Follow)
+@receiver(post_save, sender=Recipe)
+def increment_counter(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        change_counter(sender, [get_target_id(instance)], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Cart)
+@receiver(post_delete, sender=Follow)
+@receiver(post_delete, sender=Recipe)
+def decrement_counter(sender, instance, **kwargs):
+    change_counter(sender, [get_target_id(instance)], -1)
+
+
+@receiver(post_save, sender=Cart)
+@receiver(post_delete, sender=Cart)
+def refresh_user_cart_totals(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_cart_refresh([instance.user_id])
+
+
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+def refresh_recipe_cart_totals(sender, instance, raw=False, **kwargs):
+    if not raw:
+        schedule_cart_refresh(
+            recipe_ingredients={instance.recipe_id: [instance.ingredient_id]}
+        )
+
+
+@receiver(pre_save, sender=IngredientRecipe)
+def refresh_replaced_ingredient_totals(sender, instance, raw=False,
+                                       **kwargs):
+    """
+    При замене ингредиента в строке рецепта пересчитывается
+    и сумма прежнего ингредиента.
+    """
+    if raw or instance.pk is None:
+        return
+    previous = IngredientRecipe.objects.filter(pk=instance.pk).values_list(
+        'ingredient_id', flat=True
+    ).first()
+    if previous is not None and previous != instance.ingredient_id:
+        schedule_cart_refresh(
+            recipe_ingredients={instance.recipe_id: [previous]}
+        )
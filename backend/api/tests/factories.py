@@ -0,0 +1,54 @@
+from django.contrib.auth import get_user_model
+
+from foodgram.models import (Ingredient, IngredientRecipe, Recipe, Tag,
+                             TagRecipe)
+
+User = get_user_model()
+
+
+def create_user(username, **kwargs):
+    return User.objects.create_user(
+        username=username,
+        email=f'{username}@example.com',
+        password='password',
+        first_name=kwargs.pop('first_name', 'Имя'),
+        last_name=kwargs.pop('last_name', 'Фамилия'),
+        **kwargs
+    )
+
+
+def create_tags(count):
+    return [
+        Tag.objects.create(
+            name=f'Тег {index}', slug=f'tag-{index}', color=f'#0000{index:02}'
+        )
+        for index in range(count)
+    ]
+
+
+def create_ingredients(count):
+    return [
+        Ingredient.objects.create(
+            name=f'Ингредиент {index}', measurement_unit='г'
+        )
+        for index in range(count)
+    ]
+
+
+def create_recipe(author, tags=(), ingredients=(), **kwargs):
+    recipe = Recipe.objects.create(
+        author=author,
+        name=kwargs.pop('name', 'Рецепт'),
+        text=kwargs.pop('text', 'Описание'),
+        cooking_time=kwargs.pop('cooking_time', 10),
+        image=kwargs.pop('image', 'recipes/images/test.png'),
+        **kwargs
+    )
+    TagRecipe.objects.bulk_create(
+        [TagRecipe(tag=tag, recipe=recipe) for tag in tags]
+    )
+    IngredientRecipe.objects.bulk_create(
+        [IngredientRecipe(ingredient=ingredient, recipe=recipe, amount=index)
+         for index, ingredient in enumerate(ingredients, start=1)]
+    )
+    return recipe
@@ -0,0 +1,71 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from foodgram.counters import find_counter_drift
+from foodgram.models import CartIngredientTotal, Profile, Recipe
+
+from .factories import create_ingredients, create_recipe, create_user
+
+
+class BulkLinkCountersTest(TestCase):
+    """
+    Массовое добавление и удаление связей меняет счётчик ровно на единицу
+    за строку, с RETURNING и без него.
+    """
+
+    def setUp(self):
+        self.user = create_user('reader')
+        self.author = create_user('author')
+        self.recipe = create_recipe(
+            self.author, ingredients=create_ingredients(2)
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_toggle(self, url, target_id, get_counter):
+        for method, status, count in (('post', 'created', 1),
+                                      ('delete', 'deleted', 0)):
+            with self.captureOnCommitCallbacks(execute=True):
+                response = getattr(self.client, method)(
+                    url, {'ids': [target_id]}, format='json'
+                )
+            self.assertEqual(
+                response.data['results'],
+                [{'id': target_id, 'status': status}]
+            )
+            self.assertEqual(get_counter(), count)
+            self.assertEqual(find_counter_drift(), [])
+
+    def check_links(self):
+        def recipe():
+            return Recipe.objects.get(id=self.recipe.id)
+
+        self.assert_toggle(
+            '/api/recipes/bulk_favorite/', self.recipe.id,
+            lambda: recipe().favorites_count
+        )
+        self.assert_toggle(
+            '/api/users/bulk_subscribe/', self.author.id,
+            lambda: Profile.objects.get(user=self.author).followers_count
+        )
+        self.assert_toggle(
+            '/api/recipes/bulk_shopping_cart/', self.recipe.id,
+            lambda: recipe().in_carts_count
+        )
+        # Суммы списка покупок пересчитаны и после удаления.
+        self.assertFalse(CartIngredientTotal.objects.exists())
+
+    def test_returning(self):
+        if not connection.features.can_return_rows_from_bulk_insert:
+            self.skipTest('База не поддерживает RETURNING.')
+        self.check_links()
+
+    def test_without_returning(self):
+        with mock.patch.object(
+            type(connection.features), 'can_return_rows_from_bulk_insert',
+            False
+        ):
+            self.check_links()
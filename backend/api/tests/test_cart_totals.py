@@ -0,0 +1,99 @@
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from foodgram import cart_totals
+from foodgram.cart_totals import aggregate_cart_totals
+from foodgram.models import Cart, CartIngredientTotal, IngredientRecipe
+
+from .factories import create_ingredients, create_recipe, create_user
+
+
+class CartTotalsTest(TestCase):
+    """
+    Суммы списка покупок совпадают с пересчётом по исходным таблицам
+    после любых изменений корзины и состава рецептов.
+    """
+
+    def setUp(self):
+        self.user = create_user('buyer')
+        self.ingredients = create_ingredients(4)
+        self.recipes = [
+            create_recipe(create_user('author'), ingredients=self.ingredients),
+            create_recipe(
+                create_user('other'), ingredients=self.ingredients[:2]
+            ),
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_totals_fresh(self):
+        self.assertEqual(
+            {
+                (user_id, ingredient_id): total
+                for user_id, ingredient_id, total in
+                CartIngredientTotal.objects.values_list(
+                    'user_id', 'ingredient_id', 'total_amount'
+                )
+            },
+            aggregate_cart_totals()
+        )
+
+    def add_to_cart(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for recipe in self.recipes:
+                self.client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertTrue(CartIngredientTotal.objects.exists())
+        self.assert_totals_fresh()
+
+    def test_cart_toggle(self):
+        self.add_to_cart()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(
+                f'/api/recipes/{self.recipes[0].id}/shopping_cart/'
+            )
+        self.assert_totals_fresh()
+
+    def test_recipe_deleted(self):
+        self.add_to_cart()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].delete()
+        self.assert_totals_fresh()
+
+    def test_ingredient_row_edited(self):
+        self.add_to_cart()
+        row = IngredientRecipe.objects.filter(recipe=self.recipes[1]).first()
+        with self.captureOnCommitCallbacks(execute=True):
+            row.amount = 100
+            row.ingredient = self.ingredients[3]
+            row.save()
+        self.assert_totals_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            row.delete()
+        self.assert_totals_fresh()
+
+    def test_user_deleted(self):
+        self.add_to_cart()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertFalse(Cart.objects.exists())
+        self.assertFalse(CartIngredientTotal.objects.exists())
+
+    def test_rebuild_command(self):
+        self.add_to_cart()
+        CartIngredientTotal.objects.update(total_amount=0)
+        calls = []
+        module = 'foodgram.management.commands.rebuild_cart_totals'
+        with mock.patch(f'{module}.lock_profiles', side_effect=lambda: (
+            calls.append('lock'), cart_totals.lock_profiles()
+        )), mock.patch(
+            f'{module}.aggregate_cart_totals', side_effect=lambda: (
+                calls.append('aggregate'), aggregate_cart_totals()
+            )[1]
+        ):
+            call_command('rebuild_cart_totals', stdout=mock.Mock())
+        # Суммы считаются только после блокировки профилей.
+        self.assertEqual(calls, ['lock', 'aggregate'])
+        self.assert_totals_fresh()
@@ -0,0 +1,159 @@
+import threading
+
+from django.db import connection
+from django.test import TransactionTestCase, skipUnlessDBFeature
+from rest_framework.test import APIClient
+
+from foodgram.models import Cart, Favorite, Follow, Profile, Recipe
+
+from .factories import create_recipe, create_user
+
+
+def run_concurrently(*requests):
+    """
+    Выполняет запросы одновременно, каждый в своём потоке
+    со своим соединением с базой, и возвращает ответы.
+    """
+    barrier = threading.Barrier(len(requests))
+    responses = [None] * len(requests)
+
+    def worker(position, request):
+        try:
+            barrier.wait()
+            responses[position] = request()
+        finally:
+            connection.close()
+
+    threads = [
+        threading.Thread(target=worker, args=(position, request))
+        for position, request in enumerate(requests)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrencyTestCase(TransactionTestCase):
+    """
+    Параллельные запросы требуют настоящих параллельных транзакций,
+    поэтому тесты запускаются на PostgreSQL и пропускаются на SQLite.
+    """
+
+    def setUp(self):
+        self.user = create_user('reader')
+        self.author = create_user('author')
+        self.recipe_ids = [
+            create_recipe(self.author, name=f'Рецепт {index}').id
+            for index in range(5)
+        ]
+
+    def send_twice(self, method, url, data=None):
+        clients = []
+        for _ in range(2):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            clients.append(client)
+        return run_concurrently(*(
+            lambda client=client: getattr(client, method)(
+                url, data, format='json'
+            )
+            for client in clients
+        ))
+
+    def post_twice(self, url, data=None):
+        return self.send_twice('post', url, data)
+
+
+class ToggleConcurrencyTest(ConcurrencyTestCase):
+    """
+    Двойной клик: один и тот же POST одновременно из двух потоков
+    создаёт одну связь, второй запрос получает 400, а не 500.
+    """
+
+    def assert_one_created(self, responses):
+        self.assertCountEqual(
+            [response.status_code for response in responses], [201, 400]
+        )
+
+    def test_favorite(self):
+        recipe_id = self.recipe_ids[0]
+        self.assert_one_created(
+            self.post_twice(f'/api/recipes/{recipe_id}/favorite/')
+        )
+        self.assertEqual(Favorite.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            Recipe.objects.get(id=recipe_id).favorites_count, 1
+        )
+
+    def test_shopping_cart(self):
+        recipe_id = self.recipe_ids[0]
+        self.assert_one_created(
+            self.post_twice(f'/api/recipes/{recipe_id}/shopping_cart/')
+        )
+        self.assertEqual(Cart.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(Recipe.objects.get(id=recipe_id).in_carts_count, 1)
+
+    def test_subscribe(self):
+        self.assert_one_created(
+            self.post_twice(f'/api/users/{self.author.id}/subscribe/')
+        )
+        self.assertEqual(Follow.objects.filter(user=self.user).count(), 1)
+        self.assertEqual(
+            Profile.objects.get(user=self.author).followers_count, 1
+        )
+
+
+class BulkLinkConcurrencyTest(ConcurrencyTestCase):
+
+    def test_parallel_bulk_favorite_counts_each_link_once(self):
+        responses = self.post_twice(
+            '/api/recipes/bulk_favorite/', {'ids': self.recipe_ids}
+        )
+        self.assertEqual([response.status_code for response in responses],
+                         [200, 200])
+        created = [
+            item['id']
+            for response in responses
+            for item in response.data['results']
+            if item['status'] == 'created'
+        ]
+        self.assertCountEqual(created, self.recipe_ids)
+        self.assertEqual(
+            Favorite.objects.filter(user=self.user).count(),
+            len(self.recipe_ids)
+        )
+        self.assertEqual(
+            list(Recipe.objects.filter(id__in=self.recipe_ids).values_list(
+                'favorites_count', flat=True
+            )),
+            [1] * len(self.recipe_ids)
+        )
+
+    def test_parallel_bulk_unfavorite_counts_each_link_once(self):
+        Favorite.objects.bulk_create(
+            Favorite(user=self.user, recipe_id=recipe_id)
+            for recipe_id in self.recipe_ids
+        )
+        Recipe.objects.filter(id__in=self.recipe_ids).update(
+            favorites_count=1
+        )
+        responses = self.send_twice(
+            'delete', '/api/recipes/bulk_favorite/', {'ids': self.recipe_ids}
+        )
+        deleted = [
+            item['id']
+            for response in responses
+            for item in response.data['results']
+            if item['status'] == 'deleted'
+        ]
+        self.assertCountEqual(deleted, self.recipe_ids)
+        self.assertFalse(Favorite.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            list(Recipe.objects.filter(id__in=self.recipe_ids).values_list(
+                'favorites_count', flat=True
+            )),
+            [0] * len(self.recipe_ids)
+        )
@@ -0,0 +1,74 @@
+from django.contrib.admin.sites import site
+from django.test import RequestFactory, TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipePostSerializer
+from foodgram.counters import find_counter_drift
+from foodgram.models import Favorite, Recipe
+
+from .factories import (create_ingredients, create_recipe, create_tags,
+                        create_user)
+
+
+class RecipeEditKeepsCountersTest(TestCase):
+    """
+    Редактирование рецепта не затирает счётчики, изменённые другим
+    запросом после того, как рецепт был загружен.
+    """
+
+    def setUp(self):
+        self.author = create_user('author')
+        self.tags = create_tags(1)
+        self.ingredients = create_ingredients(2)
+        self.recipe = create_recipe(
+            self.author, tags=self.tags, ingredients=self.ingredients
+        )
+        Favorite.objects.create(user=create_user('first'), recipe=self.recipe)
+        self.stale = Recipe.objects.get(id=self.recipe.id)
+        Favorite.objects.create(user=create_user('second'), recipe=self.recipe)
+
+    def assert_counters_kept(self):
+        self.assertEqual(
+            Recipe.objects.get(id=self.recipe.id).favorites_count, 2
+        )
+        self.assertEqual(find_counter_drift(), [])
+
+    def test_serializer_update(self):
+        request = APIRequestFactory().patch('/')
+        request.user = self.author
+        serializer = RecipePostSerializer(
+            self.stale,
+            data={
+                'name': 'Новое название',
+                'tags': [self.tags[0].id],
+                'ingredients': [
+                    {'id': self.ingredients[0].id, 'amount': 5},
+                ],
+            },
+            partial=True,
+            context={'request': Request(request)},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        self.assertEqual(
+            Recipe.objects.get(id=self.recipe.id).name, 'Новое название'
+        )
+        self.assert_counters_kept()
+
+    def test_admin_change(self):
+        admin = site._registry[Recipe]
+        request = RequestFactory().post('/')
+        request.user = create_user('admin', is_staff=True, is_superuser=True)
+        form = admin.get_form(request, self.stale, change=True)(
+            instance=self.stale,
+            data={
+                'author': self.author.id,
+                'name': 'Новое название',
+                'text': 'Описание',
+                'cooking_time': 5,
+            },
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        admin.save_model(request, form.save(commit=False), form, True)
+        self.assert_counters_kept()
@@ -0,0 +1,83 @@
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import FastRecipeSerializer
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from foodgram.models import Cart, Favorite, Follow
+
+from .factories import (create_ingredients, create_recipe, create_tags,
+                        create_user)
+
+
+class FastRecipeSerializerTest(TestCase):
+    """
+    FastRecipeSerializer отдаёт тот же JSON, что эталонный
+    RecipeSerializer, с пустым и заполненным кешем рецептов.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags(3)
+        ingredients = create_ingredients(8)
+        authors = [create_user(f'author{index}') for index in range(3)]
+        cls.user = create_user('reader')
+        for index in range(12):
+            recipe = create_recipe(
+                authors[index % len(authors)],
+                tags=tags[:index % 3],
+                ingredients=ingredients[index % 4:index % 4 + index % 5],
+                name=f'Рецепт {index}',
+                image='' if index == 5 else 'recipes/images/test.png',
+            )
+            if index % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if index % 3:
+                Cart.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, author=authors[1])
+
+    def setUp(self):
+        cache.clear()
+
+    @staticmethod
+    def make_view(user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        return RecipeViewSet(
+            request=request, action='list', format_kwarg=None, kwargs={}
+        )
+
+    @staticmethod
+    def render_reference(view):
+        serializer = RecipeSerializer(
+            view.get_queryset().order_by('-pub_date', '-id'), many=True,
+            context=view.get_serializer_context()
+        )
+        return JSONRenderer().render(serializer.data)
+
+    @staticmethod
+    def render_fast(view):
+        rows = view.get_queryset().prefetch_related(None).values(
+            *FastRecipeSerializer.values_fields
+        ).order_by('-pub_date', '-id')
+        serializer = FastRecipeSerializer(
+            rows, context=view.get_serializer_context()
+        )
+        return JSONRenderer().render(serializer.data)
+
+    def assert_same_json(self, user):
+        view = self.make_view(user)
+        reference = self.render_reference(view)
+        for state in ('cold', 'warm'):
+            with self.subTest(state=state):
+                self.assertEqual(self.render_fast(view), reference)
+
+    def test_anonymous(self):
+        self.assert_same_json(AnonymousUser())
+
+    def test_authenticated(self):
+        self.assert_same_json(self.user)
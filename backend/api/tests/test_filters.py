@@ -0,0 +1,154 @@
+import os
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.filters import CustomRecipeFilter
+from foodgram.data_generator import DataGenerator
+from foodgram.management.commands.load_data import TAGS
+from foodgram.models import Cart, Favorite, Recipe
+
+from .factories import create_recipe, create_tags, create_user
+
+
+class RecipeFilterTest(TestCase):
+    """
+    Фильтры на EXISTS возвращают те же рецепты, что прежние JOIN
+    с DISTINCT, и ни один рецепт не повторяется.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = create_tags(3)
+        cls.user = create_user('reader')
+        author = create_user('author')
+        for index in range(12):
+            recipe = create_recipe(
+                author,
+                tags=[tag for position, tag in enumerate(cls.tags)
+                      if index >> position & 1],
+                name=f'Рецепт {index}',
+            )
+            if index % 3 == 0:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if index % 4 == 0:
+                Cart.objects.create(user=cls.user, recipe=recipe)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_ids(self, query):
+        response = self.client.get(f'/api/recipes/?limit=100&{query}')
+        self.assertEqual(response.status_code, 200)
+        ids = [recipe['id'] for recipe in response.data['results']]
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertEqual(response.data['count'], len(ids))
+        return set(ids)
+
+    def assert_same(self, query, expected):
+        self.assertEqual(
+            self.get_ids(query),
+            set(expected.distinct().values_list('id', flat=True))
+        )
+
+    def test_tags(self):
+        cases = (
+            [self.tags[0]],
+            self.tags[:2],
+            self.tags,
+        )
+        for tags in cases:
+            slugs = [tag.slug for tag in tags]
+            with self.subTest(slugs=slugs):
+                self.assert_same(
+                    '&'.join(f'tags={slug}' for slug in slugs),
+                    Recipe.objects.filter(tags__slug__in=slugs)
+                )
+
+    def test_flags(self):
+        self.assert_same(
+            'is_favorited=1', Recipe.objects.filter(favorited__user=self.user)
+        )
+        self.assert_same(
+            'is_favorited=0',
+            Recipe.objects.exclude(favorited__user=self.user)
+        )
+        self.assert_same(
+            'is_in_shopping_cart=1',
+            Recipe.objects.filter(in_cart__user=self.user)
+        )
+
+    def test_tags_with_flags(self):
+        slugs = [tag.slug for tag in self.tags]
+        self.assert_same(
+            '&'.join(f'tags={slug}' for slug in slugs)
+            + '&is_favorited=1&is_in_shopping_cart=1',
+            Recipe.objects.filter(
+                tags__slug__in=slugs,
+                favorited__user=self.user,
+                in_cart__user=self.user,
+            )
+        )
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'Планы запросов проверяются на PostgreSQL.')
+class RecipeFilterPlanTest(TestCase):
+    """
+    На сгенерированном наборе данных фильтры не используют DISTINCT
+    и размножающих строки JOIN, а подзапросы флагов идут по уникальным
+    индексам (user, recipe).
+    """
+    # По умолчанию 100 000 рецептов: 20 000 авторов по 5 рецептов.
+    users = int(os.getenv('FILTER_PLAN_TEST_USERS', 20_000))
+
+    @classmethod
+    def setUpTestData(cls):
+        DataGenerator(
+            users=cls.users, ingredients_per_recipe=1, prefix='plan'
+        ).generate()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = Favorite.objects.order_by('id').first().user
+
+    def filter(self, query):
+        request = Request(APIRequestFactory().get(f'/api/recipes/?{query}'))
+        request.user = self.user
+        queryset = CustomRecipeFilter(
+            request.query_params,
+            queryset=Recipe.objects.order_by('-pub_date'),
+            request=request,
+        ).qs
+        self.assertNotIn('DISTINCT', str(queryset.query).upper())
+        self.assertEqual(
+            queryset.count(), queryset.values('id').distinct().count()
+        )
+        return queryset.explain()
+
+    def test_tags(self):
+        plan = self.filter(
+            '&'.join(f'tags={tag["slug"]}' for tag in TAGS[:2])
+        )
+        # Без DISTINCT верхний узел плана не схлопывает повторы рецептов.
+        self.assertNotRegex(plan.splitlines()[0], r'^(Unique|HashAggregate)')
+
+    def assert_uses_unique_index(self, plan, Model, index):
+        table = Model._meta.db_table
+        self.assertNotIn(f'Seq Scan on {table}', plan)
+        self.assertRegex(plan, rf'Scan using {index} on {table}\b')
+
+    def test_flags(self):
+        cases = (
+            ('is_favorited=1', Favorite, 'unique_user_recipe'),
+            ('is_favorited=0', Favorite, 'unique_user_recipe'),
+            ('is_in_shopping_cart=1', Cart, 'unique_user_recipe_in_cart'),
+        )
+        for query, Model, index in cases:
+            with self.subTest(query=query):
+                self.assert_uses_unique_index(
+                    self.filter(query), Model, index
+                )
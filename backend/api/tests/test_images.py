@@ -0,0 +1,96 @@
+import base64
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+from PIL import Image
+from rest_framework.test import APIClient
+
+from api.images import config, recipe_storage, release_image
+from foodgram.models import Recipe
+
+from .factories import (create_ingredients, create_recipe, create_tags,
+                        create_user)
+
+
+def make_png(width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 100, 50)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class ImagePipelineTest(TestCase):
+    """
+    Уменьшенная картинка переиспользуется при повторной загрузке
+    оригинала, а используемые файлы не удаляются.
+    """
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        config_override = mock.patch.dict(
+            config, {'ASYNC': False, 'GC_GRACE_SECONDS': 0}
+        )
+        config_override.start()
+        self.addCleanup(config_override.stop)
+        self.user = create_user('author')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        original = make_png(config['MAX_SIDE'] + 400, 100)
+        self.payload = {
+            'tags': [create_tags(1)[0].id],
+            'ingredients': [
+                {'id': create_ingredients(1)[0].id, 'amount': 10}
+            ],
+            'name': 'Рецепт',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'image': 'data:image/png;base64,'
+                     + base64.b64encode(original).decode(),
+        }
+
+    def test_original_resent(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/recipes/', self.payload, format='json'
+            )
+        recipe = Recipe.objects.get(id=response.data['id'])
+        scaled = recipe.image.name
+        self.assertTrue(scaled.endswith('_scaled.png'))
+        with recipe_storage.open(scaled) as image:
+            self.assertEqual(
+                max(Image.open(image).size), config['MAX_SIDE']
+            )
+        self.assertEqual(len(os.listdir(recipe_storage.path(
+            os.path.dirname(scaled)
+        ))), 2)
+        with mock.patch(
+            'api.serializers.schedule_image_processing'
+        ) as schedule, mock.patch(
+            'api.serializers.release_image'
+        ) as release, self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                f'/api/recipes/{recipe.id}/', self.payload, format='json'
+            )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image.name, scaled)
+        schedule.assert_not_called()
+        release.assert_not_called()
+
+    def test_release_checks_references(self):
+        name = recipe_storage.save(
+            'foodgram/images/test.png', ContentFile(make_png(10, 10))
+        )
+        recipe = create_recipe(self.user, image=name)
+        release_image(name)
+        self.assertTrue(recipe_storage.exists(name))
+        recipe.delete()
+        release_image(name)
+        self.assertFalse(recipe_storage.exists(name))
@@ -0,0 +1,31 @@
+from unittest import mock
+
+from django.db import OperationalError
+from django.test import TestCase
+
+from api.ingredient_index import IngredientPrefixIndex
+
+from .factories import create_ingredients
+
+
+class IngredientIndexWarmUpTest(TestCase):
+    """
+    Индекс строится при старте воркера, а недоступная база
+    не мешает старту.
+    """
+
+    def test_warm_up_builds_index(self):
+        ingredients = create_ingredients(3)
+        index = IngredientPrefixIndex()
+        index.warm_up()
+        with mock.patch.object(index, 'build') as build:
+            self.assertEqual(len(index.search('')), len(ingredients))
+        build.assert_not_called()
+
+    def test_database_unavailable(self):
+        index = IngredientPrefixIndex()
+        with mock.patch.object(
+            index, 'build', side_effect=OperationalError
+        ), self.assertLogs('api.ingredient_index', 'WARNING'):
+            index.warm_up()
+        self.assertIsNone(index._version)
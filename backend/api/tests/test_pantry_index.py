@@ -0,0 +1,167 @@
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+
+from api.cache import bump_table_version, change_key, get_table_version
+from api.pantry_index import TABLE, PantryIndex
+from foodgram.models import IngredientRecipe
+
+from .factories import (create_ingredients, create_recipe, create_tags,
+                        create_user)
+
+
+class PantryIndexUpdateTest(TestCase):
+    """
+    После изменений рецептов индекс, обновлённый по журналу, ищет
+    так же, как построенный заново.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.ingredients = create_ingredients(6)
+        self.author = create_user('author')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes = [
+                create_recipe(self.author, ingredients=self.ingredients[
+                    index % 4:index % 4 + 3
+                ])
+                for index in range(20)
+            ]
+
+    def assert_same_as_rebuilt(self, index):
+        rebuilt = PantryIndex()
+        rebuilt.ensure_fresh()
+        for size in range(1, len(self.ingredients) + 1):
+            pantry = [ingredient.id for ingredient in self.ingredients[:size]]
+            for max_missing in (None, 0, 1):
+                self.assertEqual(
+                    index.search(pantry, max_missing),
+                    rebuilt.search(pantry, max_missing)
+                )
+
+    def test_changes_applied_in_place(self):
+        index = PantryIndex()
+        index.ensure_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            create_recipe(self.author, ingredients=self.ingredients[4:])
+        with self.captureOnCommitCallbacks(execute=True):
+            row = IngredientRecipe.objects.filter(
+                recipe=self.recipes[0]
+            ).first()
+            row.ingredient = self.ingredients[5]
+            row.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[1].delete()
+        with mock.patch.object(index, 'build') as build:
+            self.assert_same_as_rebuilt(index)
+        build.assert_not_called()
+
+    def test_ingredient_added_by_patch(self):
+        # Правка без полей рецепта и без удалённых строк не отправляет
+        # ни одного сигнала.
+        index = PantryIndex()
+        index.ensure_fresh()
+        recipe = self.recipes[0]
+        new_ingredient = self.ingredients[5]
+        self.assertNotIn(recipe.id, [
+            recipe_id for recipe_id, _, _ in index.search([new_ingredient.id])
+        ])
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.patch(f'/api/recipes/{recipe.id}/', {
+                'tags': [create_tags(1)[0].id],
+                'ingredients': [
+                    {'id': item.ingredient_id, 'amount': item.amount}
+                    for item in recipe.ingredient_recipes.all()
+                ] + [{'id': new_ingredient.id, 'amount': 1}],
+            }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(recipe.id, [
+            recipe_id for recipe_id, _, _ in index.search([new_ingredient.id])
+        ])
+
+    def test_search_keeps_its_snapshot(self):
+        index = PantryIndex()
+        index.ensure_fresh()
+        recipe_ids, sizes, postings = index._data
+        snapshot = (
+            list(recipe_ids), list(sizes),
+            {key: list(value) for key, value in postings.items()},
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[0].delete()
+            create_recipe(self.author, ingredients=self.ingredients[:2])
+        index.ensure_fresh()
+        self.assertIsNot(index._data[0], recipe_ids)
+        self.assertEqual(
+            (list(recipe_ids), list(sizes),
+             {key: list(value) for key, value in postings.items()}),
+            snapshot
+        )
+
+    def test_file_cache_rebuilds(self):
+        # incr у FileBasedCache не атомарен: журнал не ведётся,
+        # и индекс перестраивается целиком.
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location)
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': location,
+        }}):
+            index = PantryIndex()
+            index.ensure_fresh()
+            version = get_table_version(TABLE)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipes[0].delete()
+            self.assertNotEqual(get_table_version(TABLE), version)
+            self.assertIsNone(
+                cache.get(change_key(TABLE, get_table_version(TABLE)))
+            )
+            with mock.patch.object(
+                index, 'build', wraps=index.build
+            ) as build:
+                self.assert_same_as_rebuilt(index)
+            build.assert_called_once()
+
+    def test_rebuild_without_change_log(self):
+        index = PantryIndex()
+        index.ensure_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.ingredients[0].delete()
+        with mock.patch.object(
+            index, 'build', wraps=index.build
+        ) as build:
+            self.assert_same_as_rebuilt(index)
+        build.assert_called_once()
+
+
+class PantryIndexLockTest(SimpleTestCase):
+
+    def test_one_thread_rebuilds(self):
+        index = PantryIndex()
+        builds = []
+
+        def slow_build(version=None):
+            builds.append(version)
+            time.sleep(0.2)
+            index._version = version
+
+        index._version = 0
+        bump_table_version(TABLE)
+        with mock.patch.object(index, 'build', side_effect=slow_build):
+            threads = [
+                threading.Thread(target=index.ensure_fresh)
+                for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(builds), 1)
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from foodgram.models import Cart, Favorite, Follow
+
+from .factories import (create_ingredients, create_recipe, create_tags,
+                        create_user)
+
+PAGE_SIZES = (6, 30, 100)
+
+
+class RecipeListQueriesTest(TestCase):
+    """
+    Число запросов к базе на страницу рецептов не зависит от её размера.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        tags = create_tags(3)
+        ingredients = create_ingredients(10)
+        authors = [create_user(f'author{index}') for index in range(5)]
+        cls.user = create_user('reader')
+        for index in range(max(PAGE_SIZES)):
+            recipe = create_recipe(
+                authors[index % len(authors)],
+                tags=tags[:index % 3 + 1],
+                ingredients=ingredients[index % 5:index % 5 + 4],
+                name=f'Рецепт {index}',
+            )
+            if index % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if index % 3:
+                Cart.objects.create(user=cls.user, recipe=recipe)
+        Follow.objects.create(user=cls.user, author=authors[0])
+
+    def setUp(self):
+        cache.clear()
+        self.anonymous = APIClient()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assert_page_queries(self, client, cold, warm):
+        for size in PAGE_SIZES:
+            with self.subTest(size=size):
+                cache.clear()
+                with self.assertNumQueries(cold):
+                    response = client.get(f'/api/recipes/?limit={size}')
+                self.assertEqual(len(response.data['results']), size)
+                with self.assertNumQueries(warm):
+                    client.get(f'/api/recipes/?limit={size}')
+
+    def test_anonymous_list(self):
+        # COUNT, строки страницы, документы рецептов: рецепты, теги,
+        # ингредиенты. С заполненным кешем остаются COUNT и строки.
+        self.assert_page_queries(self.anonymous, cold=5, warm=2)
+
+    def test_authenticated_list(self):
+        # Плюс подписки пользователя.
+        self.assert_page_queries(self.client, cold=6, warm=3)
+
+    def test_cursor_list(self):
+        for size in PAGE_SIZES:
+            with self.subTest(size=size), self.assertNumQueries(5):
+                response = self.client.get(
+                    f'/api/recipes/?cursor=&limit={size}'
+                )
+            self.assertEqual(len(response.data['results']), size)
+            cache.clear()
+
+    def test_detail(self):
+        recipe_id = self.client.get(
+            '/api/recipes/?limit=1'
+        ).data['results'][0]['id']
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get(f'/api/recipes/{recipe_id}/')
+        with self.assertNumQueries(1):
+            self.anonymous.get(f'/api/recipes/{recipe_id}/')
@@ -0,0 +1,103 @@
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.cache import CACHE_PREFIX
+from foodgram.models import Favorite
+
+from .factories import (create_ingredients, create_recipe, create_tags,
+                        create_user)
+
+
+class RecipeCacheInvalidationTest(TestCase):
+    """
+    Правка связанных объектов сразу видна в закешированных рецептах.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user('author')
+        cls.tag = create_tags(2)[0]
+        cls.ingredient = create_ingredients(3)[0]
+        cls.recipe = create_recipe(
+            cls.author,
+            tags=[cls.tag],
+            ingredients=[cls.ingredient],
+            name='Рецепт',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user('reader'))
+        self.fetch()
+
+    def fetch(self):
+        listed = self.client.get('/api/recipes/').data['results'][0]
+        detail = self.client.get(f'/api/recipes/{self.recipe.id}/').data
+        return listed, detail
+
+    def assert_shown(self, get_value, expected):
+        for recipe in self.fetch():
+            self.assertEqual(get_value(recipe), expected)
+
+    def test_ingredient_renamed(self):
+        self.ingredient.name = 'Новое название'
+        self.ingredient.save()
+        self.assert_shown(
+            lambda recipe: recipe['ingredients'][0]['name'], 'Новое название'
+        )
+
+    def test_tag_renamed(self):
+        self.tag.name = 'Новый тег'
+        self.tag.save()
+        self.assert_shown(
+            lambda recipe: recipe['tags'][0]['name'], 'Новый тег'
+        )
+
+    def test_author_renamed(self):
+        self.author.first_name = 'Новое имя'
+        self.author.save()
+        self.assert_shown(
+            lambda recipe: recipe['author']['first_name'], 'Новое имя'
+        )
+
+
+class RecipeCacheIsolationTest(TestCase):
+    """
+    Документы рецептов из другой базы и замеров не попадают
+    в общий кеш под ключами настоящих рецептов.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.author = create_user('author')
+
+    def test_versions_seeded_on_create(self):
+        first = create_recipe(self.author)
+        second = create_recipe(self.author)
+        self.assertNotEqual(first.cache_version, 0)
+        self.assertNotEqual(first.cache_version, second.cache_version)
+
+    def test_benchmark_leaves_cache(self):
+        recipe = create_recipe(self.author, ingredients=create_ingredients(2))
+        Favorite.objects.create(user=create_user('reader'), recipe=recipe)
+        cache.set('sentinel', 1)
+        # Тестовое окружение уже настроено раннером.
+        with mock.patch(
+            'foodgram.management.commands.benchmark_recipe_serializer.'
+            'setup_test_environment'
+        ):
+            call_command(
+                'benchmark_recipe_serializer', pages=1, repeat=1,
+                stdout=io.StringIO()
+            )
+        self.assertEqual(cache.get('sentinel'), 1)
+        self.assertFalse([
+            key for key in cache._cache
+            if f'{CACHE_PREFIX}:recipe:' in key
+        ])
@@ -0,0 +1,84 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.serializers import RecipePostSerializer
+from foodgram.models import IngredientRecipe, Recipe, TagRecipe
+
+from .factories import (create_ingredients, create_recipe, create_tags,
+                        create_user)
+
+LINK_TABLES = (IngredientRecipe._meta.db_table, TagRecipe._meta.db_table)
+
+
+class RecipeUpdateWriteSetTest(TestCase):
+    """
+    Правка рецепта пишет только изменившиеся строки связей.
+    """
+
+    def setUp(self):
+        self.author = create_user('author')
+        self.tags = create_tags(2)
+        self.ingredients = create_ingredients(3)
+        self.recipe = create_recipe(
+            self.author, tags=self.tags, ingredients=self.ingredients
+        )
+
+    def update(self, **changes):
+        request = APIRequestFactory().patch('/')
+        request.user = self.author
+        data = {
+            'name': self.recipe.name,
+            'tags': [tag.id for tag in self.tags],
+            'ingredients': [
+                {'id': item.ingredient_id, 'amount': item.amount}
+                for item in self.recipe.ingredient_recipes.order_by('id')
+            ],
+            **changes,
+        }
+        serializer = RecipePostSerializer(
+            Recipe.objects.get(id=self.recipe.id),
+            data=data,
+            partial=True,
+            context={'request': Request(request)},
+        )
+        serializer.is_valid(raise_exception=True)
+        with CaptureQueriesContext(connection) as queries:
+            serializer.save()
+        writes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].split(None, 1)[0] in ('INSERT', 'UPDATE',
+                                                  'DELETE')
+            and any(f'"{table}"' in query['sql'] for table in LINK_TABLES)
+        ]
+        return serializer.rows_touched, writes
+
+    def test_name_only(self):
+        rows, writes = self.update(name='Новое название')
+        self.assertEqual(set(rows.values()), {0})
+        self.assertEqual(writes, [])
+        self.assertEqual(
+            Recipe.objects.get(id=self.recipe.id).name, 'Новое название'
+        )
+
+    def test_one_amount_changed(self):
+        ingredients = [
+            {'id': ingredient.id, 'amount': index}
+            for index, ingredient in enumerate(self.ingredients, start=1)
+        ]
+        ingredients[1]['amount'] = 50
+        rows, writes = self.update(ingredients=ingredients)
+        self.assertEqual(rows, {
+            'ingredients_deleted': 0, 'ingredients_created': 0,
+            'ingredients_updated': 1, 'tags_deleted': 0, 'tags_created': 0,
+        })
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('UPDATE'))
+        self.assertEqual(
+            IngredientRecipe.objects.get(
+                recipe=self.recipe, ingredient=self.ingredients[1]
+            ).amount,
+            50
+        )
@@ -0,0 +1,61 @@
+from django.test import TestCase
+
+from foodgram.models import Ingredient, IngredientRecipe
+from foodgram.search import search_recipes
+
+from .factories import create_recipe, create_user
+
+
+class SearchIndexSignalsTest(TestCase):
+    """
+    Поисковый документ обновляется после любого изменения рецепта
+    или его ингредиентов, а не только из сериализатора и админки.
+    """
+
+    def setUp(self):
+        self.tomato = Ingredient.objects.create(
+            name='помидор', measurement_unit='г'
+        )
+        self.basil = Ingredient.objects.create(
+            name='базилик', measurement_unit='г'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = create_recipe(
+                create_user('author'), ingredients=[self.tomato],
+                name='Летний салат'
+            )
+
+    def test_recipe_created(self):
+        self.assertEqual(search_recipes('салат'), [self.recipe.id])
+        self.assertEqual(search_recipes('помидор'), [self.recipe.id])
+
+    def test_recipe_saved(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = 'Осенний суп'
+            self.recipe.save()
+        self.assertEqual(search_recipes('салат'), [])
+        self.assertEqual(search_recipes('суп'), [self.recipe.id])
+
+    def test_ingredient_rows_changed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientRecipe.objects.create(
+                recipe=self.recipe, ingredient=self.basil, amount=5
+            )
+        self.assertEqual(search_recipes('базилик'), [self.recipe.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientRecipe.objects.filter(ingredient=self.basil).delete()
+        self.assertEqual(search_recipes('базилик'), [])
+
+    def test_ingredient_renamed_and_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tomato.name = 'томат'
+            self.tomato.save()
+        self.assertEqual(search_recipes('томат'), [self.recipe.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tomato.delete()
+        self.assertEqual(search_recipes('томат'), [])
+
+    def test_recipe_deleted(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(search_recipes('салат'), [])
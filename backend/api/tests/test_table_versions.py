@@ -0,0 +1,45 @@
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+
+from api.cache import get_table_version
+from api.ingredient_index import ingredient_index
+
+from .factories import create_ingredients, create_tags
+
+
+class TableVersionTest(TestCase):
+    """
+    Версии справочников меняются только после фиксации транзакции,
+    иначе ответ по старым строкам закешируется под новой версией.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_tag_saved(self):
+        tag = create_tags(1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            version = get_table_version('tag')
+            tag.name = 'Новый тег'
+            tag.save()
+            self.assertEqual(get_table_version('tag'), version)
+            self.client.get('/api/tags/')
+        self.assertNotEqual(get_table_version('tag'), version)
+        self.assertEqual(
+            self.client.get('/api/tags/').json()[0]['name'], 'Новый тег'
+        )
+
+    def test_ingredient_saved(self):
+        ingredient = create_ingredients(1)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            version = get_table_version('ingredient')
+            ingredient.name = 'Новое название'
+            ingredient.save()
+            self.assertEqual(get_table_version('ingredient'), version)
+        self.assertNotEqual(get_table_version('ingredient'), version)
+        self.assertEqual(
+            ingredient_index.search('новое'),
+            [(ingredient.id, 'Новое название', ingredient.measurement_unit)]
+        )
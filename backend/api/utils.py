@@ -1,16 +1,51 @@
+from rest_framework.exceptions import ValidationError
+
 from foodgram.models import Cart, Favorite, Follow
 
+RECIPES_LIMIT_MAX = 100
+
+
+class SubscriptionLoader:
+    """
+    Загружает id авторов, на которых подписан пользователь,
+    одним запросом на весь ответ.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._author_ids = None
+
+    @property
+    def author_ids(self):
+        if self._author_ids is None:
+            if self.user.is_authenticated:
+                self._author_ids = set(
+                    Follow.objects.filter(user=self.user).values_list(
+                        'author_id', flat=True
+                    )
+                )
+            else:
+                self._author_ids = set()
+        return self._author_ids
+
+    def is_subscribed(self, author_id):
+        return author_id in self.author_ids
+
 
 def get_is_subscribed(self, obj):
+    author_id = obj.author_id if hasattr(obj, 'author_id') else obj.id
+    loader = self.context.get('subscriptions')
+    if loader is not None:
+        return loader.is_subscribed(author_id)
     user = self.context.get('request').user
     if not user.is_authenticated:
         return False
-    if hasattr(obj, 'author'):
-        return Follow.objects.filter(user=user, author=obj.author.id).exists()
-    return Follow.objects.filter(user=user, author=obj.id).exists()
+    return Follow.objects.filter(user=user, author=author_id).exists()
 
 
 def get_is_favorited(self, obj):
+    if hasattr(obj, 'is_favorited'):
+        return obj.is_favorited
     user = self.context.get('request').user
     if user.is_authenticated:
         return Favorite.objects.filter(user=user, recipe=obj).exists()
@@ -18,7 +53,30 @@ def get_is_favorited(self, obj):
 
 
 def get_is_in_shopping_cart(self, obj):
+    if hasattr(obj, 'is_in_shopping_cart'):
+        return obj.is_in_shopping_cart
     user = self.context.get('request').user
     if user.is_authenticated:
         return Cart.objects.filter(user=user, recipe=obj).exists()
     return False
+
+
+def get_recipes_limit(request):
+    """
+    Возвращает значение параметра recipes_limit,
+    ограниченное сверху RECIPES_LIMIT_MAX.
+    """
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit is None:
+        return RECIPES_LIMIT_MAX
+    try:
+        recipes_limit = int(recipes_limit)
+    except ValueError:
+        raise ValidationError(
+            {'recipes_limit': 'Укажите целое неотрицательное число!'}
+        )
+    if recipes_limit < 0:
+        raise ValidationError(
+            {'recipes_limit': 'Укажите целое неотрицательное число!'}
+        )
+    return min(recipes_limit, RECIPES_LIMIT_MAX)
@@ -1,31 +1,153 @@
-import io
-
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef,
+                              Prefetch, Subquery, Value)
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from djoser.views import UserViewSet as DjoserUserViewSet
 from django_filters.rest_framework import DjangoFilterBackend
-from reportlab.pdfbase import pdfmetrics, ttfonts
-from reportlab.pdfgen import canvas
-from rest_framework import filters, permissions, status, viewsets
+from rest_framework import (filters, generics, permissions, status,
+                            viewsets)
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 
 from api.filters import CustomRecipeFilter, CustomIngredientFilter
-from foodgram.models import (Cart, Favorite, Follow, Ingredient,
-                             IngredientRecipe, Recipe, Tag)
-from .pagination import PageLimitPagination
+from foodgram.cart_totals import schedule_cart_refresh
+from foodgram.counters import change_counter
+from foodgram.search import search_recipes
+from foodgram.models import (Cart, CartIngredientTotal, Favorite, Follow,
+                             Ingredient, IngredientRecipe, Recipe, Tag)
+from .cache import VersionedCacheMixin
+from .fast_serializers import FastRecipeSerializer
+from .pantry_index import pantry_index
+from .pagination import (CursorPageLimitPagination, FeedCursorPagination,
+                         PageLimitPagination, SubscriptionCursorPagination)
 from .permissions import AuthorOrReadOnly
-from .serializers import (FollowSerializer, IngredientSerializer,
-                          RecipePostSerializer, RecipeSerializer,
-                          ShortRecipeSerializer, TagSerializer)
+from .serializers import (BulkIdsSerializer, FollowSerializer,
+                          IngredientSerializer, RecipePostSerializer,
+                          RecipeSerializer, ShortRecipeSerializer,
+                          TagSerializer)
+from .shopping_list import RENDERERS
+from .utils import SubscriptionLoader, get_recipes_limit
 
 User = get_user_model()
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+def insert_links(Model, user_id, field, target_ids):
+    """
+    Вставляет связи пользователя с target_ids, пропуская уже существующие,
+    и возвращает id, для которых строка вставлена именно этим запросом:
+    параллельный запрос мог успеть вставить часть из них. Сигналы
+    не отправляются, счётчики меняет вызывающий код.
+    """
+    if not target_ids:
+        return set()
+    if not connection.features.can_return_rows_from_bulk_insert:
+        inserted = set()
+        for target_id in target_ids:
+            try:
+                with transaction.atomic():
+                    Model.objects.bulk_create([
+                        Model(user_id=user_id, **{f'{field}_id': target_id})
+                    ])
+            except IntegrityError:
+                continue
+            inserted.add(target_id)
+        return inserted
+    quote = connection.ops.quote_name
+    column = Model._meta.get_field(field).column
+    placeholders = ', '.join(['(%s, %s)'] * len(target_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(Model._meta.db_table)} '
+            f'({quote("user_id")}, {quote(column)}) '
+            f'VALUES {placeholders} ON CONFLICT DO NOTHING '
+            f'RETURNING {quote(column)}',
+            [value for target_id in target_ids
+             for value in (user_id, target_id)]
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+
+def delete_links(Model, user_id, field, target_ids):
+    """
+    Удаляет связи пользователя с target_ids и возвращает id, чьи строки
+    удалил именно этот запрос: строки, которые успел удалить
+    параллельный запрос, не учитываются. Сигналы не отправляются,
+    счётчики меняет вызывающий код.
+    """
+    if not target_ids:
+        return set()
+    quote = connection.ops.quote_name
+    table = quote(Model._meta.db_table)
+    column = quote(Model._meta.get_field(field).column)
+    placeholders = ', '.join(['%s'] * len(target_ids))
+    where = f'{quote("user_id")} = %s AND {column} IN ({placeholders})'
+    with connection.cursor() as cursor:
+        if connection.features.can_return_rows_from_bulk_insert:
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {where} RETURNING {column}',
+                [user_id, *target_ids]
+            )
+            return {row[0] for row in cursor.fetchall()}
+        # Без RETURNING удаляемые строки сначала блокируются: параллельный
+        # запрос дождётся фиксации и их уже не увидит.
+        deleted = set(Model.objects.select_for_update().filter(
+            user_id=user_id, **{f'{field}__in': target_ids}
+        ).values_list(f'{field}_id', flat=True))
+        if deleted:
+            placeholders = ', '.join(['%s'] * len(deleted))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE {quote("user_id")} = %s '
+                f'AND {column} IN ({placeholders})',
+                [user_id, *deleted]
+            )
+        return deleted
+
+
+@transaction.atomic
+def bulk_link(request, Model, field, targets):
+    """
+    Добавляет (POST) или удаляет (DELETE) связи пользователя с объектами
+    из списка ids одной вставкой или одним удалением.
+    Возвращает результат по каждому id и множество изменённых id.
+    """
+    serializer = BulkIdsSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    ids = list(dict.fromkeys(serializer.validated_data['ids']))
+    found = set(targets.filter(id__in=ids).values_list('id', flat=True))
+    linked = set(Model.objects.filter(
+        user=request.user, **{f'{field}__in': ids}
+    ).values_list(f'{field}_id', flat=True))
+    if request.method == 'POST':
+        changed = insert_links(
+            Model, request.user.id, field,
+            [target_id for target_id in ids
+             if target_id in found and target_id not in linked]
+        )
+        delta = 1
+        done, skipped = 'created', 'already_exists'
+    else:
+        changed = delete_links(Model, request.user.id, field, list(linked))
+        delta = -1
+        done, skipped = 'deleted', 'not_exists'
+    if changed:
+        change_counter(Model, changed, delta)
+    results = []
+    for target_id in ids:
+        if target_id in changed:
+            result = done
+        elif target_id in found or target_id in linked:
+            result = skipped
+        else:
+            result = 'not_found'
+        results.append({'id': target_id, 'status': result})
+    return results, changed
+
+
+class TagViewSet(VersionedCacheMixin, viewsets.ReadOnlyModelViewSet):
+    cache_table = 'tag'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (permissions.AllowAny,)
@@ -36,22 +158,84 @@ class RecipeViewSet(viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
     permission_classes = (AuthorOrReadOnly,)
-    pagination_class = PageLimitPagination
+    pagination_class = CursorPageLimitPagination
     filter_backends = (DjangoFilterBackend, filters.OrderingFilter,)
     filterset_class = CustomRecipeFilter
-    ordering_fields = ('pub_date',)
+    ordering_fields = ('pub_date', 'popularity')
     ordering = ('-pub_date',)
 
+    def get_queryset(self):
+        queryset = Recipe.objects.select_related(
+            'author__profile'
+        ).prefetch_related(
+            Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            Prefetch(
+                'ingredient_recipes',
+                queryset=IngredientRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('id')
+            ),
+        )
+        user = self.request.user
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False, output_field=BooleanField()),
+                is_in_shopping_cart=Value(False, output_field=BooleanField()),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(Favorite.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+            is_in_shopping_cart=Exists(Cart.objects.filter(
+                user=user, recipe=OuterRef('pk')
+            )),
+        )
+
     def get_permissions(self):
-        if self.action == 'download_shopping_cart':
+        if self.action in ('download_shopping_cart', 'feed'):
             return (permissions.IsAuthenticated(),)
         return super().get_permissions()
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['subscriptions'] = SubscriptionLoader(self.request.user)
+        return context
+
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve',):
+        if self.action in ('list', 'retrieve', 'feed', 'search', 'pantry',):
             return RecipeSerializer
         return RecipePostSerializer
 
+    def list(self, request, *args, **kwargs):
+        return self.fast_list_response(
+            self.filter_queryset(self.get_queryset())
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        row = generics.get_object_or_404(
+            self.filter_queryset(self.get_queryset()).prefetch_related(
+                None
+            ).values(*FastRecipeSerializer.values_fields),
+            pk=kwargs['pk']
+        )
+        serializer = FastRecipeSerializer(
+            [row], context=self.get_serializer_context()
+        )
+        return Response(serializer.data[0])
+
+    def fast_list_response(self, queryset):
+        """
+        Отдаёт страницу рецептов через FastRecipeSerializer.
+        """
+        rows = queryset.prefetch_related(None).values(
+            *FastRecipeSerializer.values_fields, *self.ordering_fields
+        )
+        page = self.paginate_queryset(rows)
+        serializer = FastRecipeSerializer(
+            page, context=self.get_serializer_context()
+        )
+        return self.get_paginated_response(serializer.data)
+
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
@@ -59,31 +243,40 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                   Model,
                                   post_bad_request_text,
                                   delete_bad_request_text):
-        try:
-            recipe = get_object_or_404(Recipe, id=pk)
-        except Exception:
-            return Response(
-                {'Похоже, такого рецепта не существует!'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-        filtered_recipes = Model.objects.filter(
-            user=self.request.user,
-            recipe=recipe
+        """
+        Добавляет или удаляет рецепт, полагаясь на уникальное ограничение
+        вместо предварительной проверки exists().
+        """
+        not_found_response = Response(
+            {'Похоже, такого рецепта не существует!'},
+            status=status.HTTP_400_BAD_REQUEST
         )
-        exists = filtered_recipes.exists()
+        try:
+            pk = int(pk)
+        except ValueError:
+            return not_found_response
         if self.request.method == 'POST':
-            if exists:
+            recipe = Recipe.objects.filter(id=pk).first()
+            if recipe is None:
+                return not_found_response
+            try:
+                with transaction.atomic():
+                    Model.objects.create(user=self.request.user, recipe=recipe)
+            except IntegrityError:
                 return Response(
                     {post_bad_request_text},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            Model.objects.create(user=self.request.user, recipe=recipe)
             serializer = ShortRecipeSerializer(recipe)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        if exists:
-            filtered_recipes.delete()
+        deleted, _ = Model.objects.filter(
+            user=self.request.user, recipe_id=pk
+        ).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
+        if not Recipe.objects.filter(id=pk).exists():
+            return not_found_response
         return Response(
             {delete_bad_request_text},
             status=status.HTTP_400_BAD_REQUEST
@@ -109,32 +302,132 @@ class RecipeViewSet(viewsets.ModelViewSet):
                                               post_bad_request_text,
                                               delete_bad_request_text)
 
+    @action(methods=['get'], detail=False,
+            pagination_class=FeedCursorPagination)
+    def feed(self, request):
+        """
+        Рецепты авторов из подписок пользователя, новые сверху,
+        одним запросом по индексу (author, pub_date, id).
+        """
+        recipes = self.filter_queryset(self.get_queryset()).filter(
+            author__in=Follow.objects.filter(
+                user=request.user
+            ).values('author')
+        )
+        return self.fast_list_response(recipes)
+
+    @action(methods=['get'], detail=False,
+            pagination_class=PageLimitPagination)
+    def search(self, request):
+        """
+        Полнотекстовый поиск по названию, ингредиентам и описанию,
+        результаты отсортированы по релевантности.
+        """
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response(
+                {'q': 'Укажите строку поиска!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page = self.paginate_queryset(search_recipes(query))
+        recipes = self.get_queryset().in_bulk(page)
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id in page
+             if recipe_id in recipes],
+            many=True
+        )
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['get'], detail=False,
+            pagination_class=PageLimitPagination)
+    def pantry(self, request):
+        """
+        Рецепты из имеющихся ингредиентов ?ingredients=1,2,3: по убыванию
+        доли имеющихся ингредиентов, ?missing=K оставляет рецепты,
+        где не хватает не больше K ингредиентов.
+        """
+        try:
+            ingredient_ids = [
+                int(value)
+                for values in request.query_params.getlist('ingredients')
+                for value in values.split(',') if value
+            ]
+            max_missing = request.query_params.get('missing')
+            if max_missing is not None:
+                max_missing = int(max_missing)
+                if max_missing < 0:
+                    raise ValueError
+        except ValueError:
+            return Response(
+                {'Error massage': 'id ингредиентов и missing должны быть '
+                                  'целыми неотрицательными числами!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not ingredient_ids:
+            return Response(
+                {'ingredients': 'Укажите хотя бы один ингредиент!'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        page = self.paginate_queryset(
+            pantry_index.search(ingredient_ids, max_missing)
+        )
+        recipes = self.get_queryset().in_bulk(
+            [recipe_id for recipe_id, *_ in page]
+        )
+        serializer = self.get_serializer(
+            [recipes[recipe_id] for recipe_id, *_ in page
+             if recipe_id in recipes],
+            many=True
+        )
+        scores = {
+            recipe_id: (coverage, missing)
+            for recipe_id, coverage, missing in page
+        }
+        for item in serializer.data:
+            item['coverage'], item['missing'] = scores[item['id']]
+        return self.get_paginated_response(serializer.data)
+
+    @action(methods=['post', 'delete'], detail=False)
+    def bulk_favorite(self, request):
+        results, _ = bulk_link(request, Favorite, 'recipe', Recipe.objects)
+        return Response({'results': results})
+
+    @action(methods=['post', 'delete'], detail=False)
+    def bulk_shopping_cart(self, request):
+        results, changed = bulk_link(request, Cart, 'recipe', Recipe.objects)
+        if changed:
+            schedule_cart_refresh([request.user.id])
+        return Response({'results': results})
+
     @action(methods=['get'], detail=False)
     def download_shopping_cart(self, request):
-        ingredients = IngredientRecipe.objects.filter(
-            recipe__in_cart__user=request.user.id).values(
-                'ingredient__name', 'ingredient__measurement_unit').annotate(
-                    total_amount=Sum('amount'))
-        buffer = io.BytesIO()
-        pdf = canvas.Canvas(buffer)
-        MyFontObject = ttfonts.TTFont('arial', 'arial.ttf')
-        pdfmetrics.registerFont(MyFontObject)
-        pdf.setFont('arial', 12)
-        pdf.drawString(200, 750, "Список покупок")
-        x, y = 100, 725
-        for element in ingredients:
-            string = (f'• {element["ingredient__name"]} '
-                      f'({element["ingredient__measurement_unit"]}) — '
-                      f'{element["total_amount"]}')
-            pdf.drawString(x, y, string)
-            y -= 25
-        pdf.showPage()
-        pdf.save()
-        buffer.seek(0)
-        return FileResponse(buffer, as_attachment=True, filename="cart.pdf")
-
-
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+        file_format = request.query_params.get('file_format', 'pdf')
+        if file_format not in RENDERERS:
+            return Response(
+                {'file_format': 'Доступные форматы: '
+                                f'{", ".join(RENDERERS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        render, content_type = RENDERERS[file_format]
+        ingredients = CartIngredientTotal.objects.filter(
+            user=request.user).values(
+                'total_amount',
+                name=F('ingredient__name'),
+                measurement_unit=F('ingredient__measurement_unit')).order_by(
+                    'name')
+        response = StreamingHttpResponse(
+            render(ingredients.iterator()),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="cart.{file_format}"'
+        )
+        return response
+
+
+class IngredientViewSet(VersionedCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
+    cache_table = 'ingredient'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (permissions.AllowAny,)
@@ -144,7 +437,7 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
 
 
 class UserViewSet(DjoserUserViewSet):
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('profile')
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = PageLimitPagination
 
@@ -155,23 +448,52 @@ class UserViewSet(DjoserUserViewSet):
             return (permissions.IsAuthenticated(),)
         return super().get_permissions()
 
-    @action(methods=['get'], detail=False)
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['subscriptions'] = SubscriptionLoader(self.request.user)
+        return context
+
+    def get_follow_queryset(self):
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit == 0:
+            recipes = Recipe.objects.none()
+        else:
+            recipes = Recipe.objects.filter(id__in=Subquery(
+                Recipe.objects.filter(
+                    author=OuterRef('author')
+                ).values('id')[:recipes_limit]
+            ))
+        return Follow.objects.filter(
+            user=self.request.user
+        ).select_related('author__profile').prefetch_related(
+            Prefetch('author__recipes', queryset=recipes,
+                     to_attr='recipe_previews')
+        ).order_by('id')
+
+    @action(methods=['get'], detail=False,
+            pagination_class=SubscriptionCursorPagination)
     def subscriptions(self, request):
-        user = self.request.user.id
-        subscriptions = Follow.objects.filter(user=user)
+        subscriptions = self.get_follow_queryset()
         page = self.paginate_queryset(subscriptions)
         serializer = FollowSerializer(
             page,
             many=True,
-            context={'request': request}
+            context=self.get_serializer_context()
         )
         return self.get_paginated_response(serializer.data)
 
+    @action(methods=['post', 'delete'], detail=False)
+    def bulk_subscribe(self, request):
+        results, _ = bulk_link(
+            request, Follow, 'author',
+            User.objects.exclude(id=request.user.id)
+        )
+        return Response({'results': results})
+
     @action(methods=['post', 'delete'], detail=True)
     def subscribe(self, request, id):
         author = get_object_or_404(User, id=self.kwargs.get('id'))
         user = self.request.user
-        subscription = Follow.objects.filter(user=user, author=author)
 
         if self.request.method == 'POST':
             if user == author:
@@ -179,19 +501,24 @@ class UserViewSet(DjoserUserViewSet):
                     {'Error massage': 'Нельзя подписаться на самого себя!'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            if subscription.exists():
+            try:
+                with transaction.atomic():
+                    subscription = Follow.objects.create(
+                        user=user, author=author
+                    )
+            except IntegrityError:
                 return Response(
                     {'Error massage': 'Подписка уже существует!'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            subscription = Follow.objects.create(user=user, author=author)
             serializer = FollowSerializer(
-                subscription, context={'request': request}
+                self.get_follow_queryset().get(id=subscription.id),
+                context=self.get_serializer_context()
             )
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-        if subscription.exists():
-            subscription.delete()
+        deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+        if deleted:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response(
             {'Error massage': 'Такой подписки не существует!'},
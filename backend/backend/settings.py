@@ -32,6 +32,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -73,6 +74,16 @@ DATABASES = {
 }
 
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -106,6 +117,25 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/media'  # os.path.join(BASE_DIR, 'media')
 
+IMAGE_PIPELINE = {
+    'MAX_UPLOAD_BYTES': int(os.getenv('IMAGE_MAX_UPLOAD_BYTES', 5 * 1024 * 1024)),
+    'MAX_PIXELS': 40_000_000,
+    'MAX_SIDE': 1600,
+    'THUMBNAIL_SIZES': {'small': 320, 'medium': 640},
+    'WORKERS': int(os.getenv('IMAGE_PIPELINE_WORKERS', 2)),
+    'ASYNC': os.getenv('IMAGE_PIPELINE_ASYNC', 'True') == 'True',
+    'GC_GRACE_SECONDS': int(os.getenv('IMAGE_GC_GRACE_SECONDS', 60 * 60)),
+}
+
+# Картинка приходит в JSON строкой base64 (+1/3 к размеру), плюс запас на остальные поля рецепта.
+DATA_UPLOAD_MAX_MEMORY_SIZE = IMAGE_PIPELINE['MAX_UPLOAD_BYTES'] * 4 // 3 + 1024 * 1024
+
+POPULARITY = {
+    'FAVORITE_WEIGHT': float(os.getenv('POPULARITY_FAVORITE_WEIGHT', 1.0)),
+    'CART_WEIGHT': float(os.getenv('POPULARITY_CART_WEIGHT', 2.0)),
+    'HALF_LIFE_HOURS': float(os.getenv('POPULARITY_HALF_LIFE_HOURS', 72)),
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -135,4 +165,24 @@ DJOSER = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
+SQL_INSTRUMENTATION = {
+    'SAMPLE_RATE': float(os.getenv('SQL_INSTRUMENTATION_SAMPLE_RATE', 0.01)),
+    'SLOW_REQUEST_MS': float(os.getenv('SQL_SLOW_REQUEST_MS', 500)),
+    'N_PLUS_ONE_THRESHOLD': int(os.getenv('SQL_N_PLUS_ONE_THRESHOLD', 5)),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.sql': {
+            'handlers': ['console'],
+            'level': os.getenv('SQL_LOG_LEVEL', 'INFO'),
+        },
+    },
+}
+
 CSRF_TRUSTED_ORIGINS = ['https://hamann08.hopto.org']
@@ -22,9 +22,26 @@ class RecipeAdmin(admin.ModelAdmin):
     search_fields = ('author', 'name', 'tags')
     list_filter = ('author', 'name', 'tags',)
     inlines = (TagRecipeInline, IngredientRecipeInline)
-
+    list_select_related = ('author',)
+    readonly_fields = (
+        'favorites_count', 'in_carts_count', 'popularity', 'touched_at',
+        'popularity_updated_at',
+    )
+
+    def save_model(self, request, obj, form, change):
+        """
+        При изменении сохраняет только поля формы: счётчики и популярность
+        меняются параллельно через F-выражения, и полное сохранение
+        вернуло бы их значения на момент открытия формы.
+        """
+        if change:
+            obj.save(update_fields=list(form.fields))
+        else:
+            obj.save()
+
+    @admin.display(description='В избранном', ordering='favorites_count')
     def favorited_count(self, obj):
-        return obj.favorited.count()
+        return obj.favorites_count
 
 
 class TagRecipeAdmin(admin.ModelAdmin):
@@ -53,8 +70,20 @@ class CartAdmin(admin.ModelAdmin):
 
 
 class UserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'email', 'username', 'first_name', 'last_name',)
+    list_display = ('id', 'email', 'username', 'first_name', 'last_name',
+                    'recipes_count', 'followers_count',)
     list_filter = ('email', 'username')
+    list_select_related = ('profile',)
+
+    @admin.display(description='Рецептов',
+                   ordering='profile__recipes_count')
+    def recipes_count(self, obj):
+        return obj.profile.recipes_count
+
+    @admin.display(description='Подписчиков',
+                   ordering='profile__followers_count')
+    def followers_count(self, obj):
+        return obj.profile.followers_count
 
 
 admin.site.register(Recipe, RecipeAdmin)
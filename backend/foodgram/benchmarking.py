@@ -0,0 +1,47 @@
+from django.test.utils import override_settings
+
+
+def add_generator_arguments(parser):
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--recipes-per-author', type=int, default=5)
+    parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+    parser.add_argument('--follows-per-user', type=int, default=5)
+    parser.add_argument('--favorites-per-user', type=int, default=10)
+    parser.add_argument('--carts-per-user', type=int, default=3)
+    parser.add_argument(
+        '--prefix', default='bench',
+        help='Префикс имён создаваемых пользователей.'
+    )
+
+
+def generator_options(options):
+    return {
+        'seed': options['seed'],
+        'recipes_per_author': options['recipes_per_author'],
+        'ingredients_per_recipe': options['ingredients_per_recipe'],
+        'follows_per_user': options['follows_per_user'],
+        'favorites_per_user': options['favorites_per_user'],
+        'carts_per_user': options['carts_per_user'],
+        'prefix': options['prefix'],
+    }
+
+
+def percentile(values, percent):
+    """
+    Значение перцентиля percent по ближайшему рангу.
+    """
+    values = sorted(values)
+    position = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[position]
+
+
+def isolated_cache():
+    """
+    Подменяет кеш на время замера отдельным LocMemCache: замеры очищают
+    кеш и пишут в него документы рецептов из тестовой базы, которые
+    не должны попасть в общий кеш работающего сайта.
+    """
+    return override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }})
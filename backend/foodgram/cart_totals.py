@@ -0,0 +1,148 @@
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from .models import Cart, CartIngredientTotal, IngredientRecipe, Profile
+
+
+def aggregate_cart_totals(user_ids=None, ingredient_ids=None):
+    """
+    Считает суммы ингредиентов в списках покупок по исходным таблицам.
+    """
+    lookups = {'recipe__in_cart__isnull': False}
+    if user_ids is not None:
+        lookups['recipe__in_cart__user__in'] = user_ids
+    if ingredient_ids is not None:
+        lookups['ingredient__in'] = ingredient_ids
+    return {
+        (row['recipe__in_cart__user'], row['ingredient']): row['total']
+        for row in IngredientRecipe.objects.filter(**lookups).values(
+            'recipe__in_cart__user', 'ingredient'
+        ).annotate(total=Sum('amount')).order_by()
+    }
+
+
+def lock_profiles(user_ids=None):
+    """
+    Блокирует профили пользователей до конца транзакции, всегда
+    в порядке user_id, чтобы пересчёты не взаимоблокировались.
+    """
+    profiles = Profile.objects.select_for_update()
+    if user_ids is not None:
+        profiles = profiles.filter(user__in=user_ids)
+    return list(profiles.order_by('user_id').values_list('user_id', flat=True))
+
+
+@transaction.atomic
+def refresh_cart_totals(user_ids, ingredient_ids=None):
+    """
+    Пересчитывает CartIngredientTotal только для затронутых
+    пар пользователь-ингредиент, а без ingredient_ids — все суммы
+    пользователей. Пересчёты одного пользователя выполняются по очереди
+    под блокировкой его профиля, поэтому видят последние данные корзины.
+    """
+    user_ids = sorted(set(user_ids))
+    if ingredient_ids is not None:
+        ingredient_ids = list(ingredient_ids)
+        if not ingredient_ids:
+            return
+    if not user_ids:
+        return
+    lock_profiles(user_ids)
+    totals = aggregate_cart_totals(user_ids, ingredient_ids)
+    existing = CartIngredientTotal.objects.filter(user__in=user_ids)
+    if ingredient_ids is not None:
+        existing = existing.filter(ingredient__in=ingredient_ids)
+    stale = [
+        total_id for total_id, user_id, ingredient_id in existing.values_list(
+            'id', 'user_id', 'ingredient_id'
+        )
+        if (user_id, ingredient_id) not in totals
+    ]
+    if stale:
+        CartIngredientTotal.objects.filter(id__in=stale).delete()
+    CartIngredientTotal.objects.bulk_create(
+        [
+            CartIngredientTotal(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total_amount
+            )
+            for (user_id, ingredient_id), total_amount in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['user_id', 'ingredient_id'],
+        update_fields=['total_amount'],
+    )
+
+
+@transaction.atomic
+def rebuild_cart_totals(totals=None):
+    """
+    Пересобирает CartIngredientTotal целиком под блокировкой всех
+    профилей, чтобы пересчёты отдельных пользователей не вклинились
+    между подсчётом и записью. Переданные totals должны быть посчитаны
+    в той же транзакции после lock_profiles().
+    """
+    if totals is None:
+        lock_profiles()
+        totals = aggregate_cart_totals()
+    CartIngredientTotal.objects.all().delete()
+    CartIngredientTotal.objects.bulk_create(
+        (
+            CartIngredientTotal(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total_amount,
+            )
+            for (user_id, ingredient_id), total_amount in totals.items()
+        ),
+        batch_size=1000,
+    )
+
+
+def get_pending_refresh():
+    pending = getattr(connection, 'cart_refresh_pending', None)
+    if pending is None:
+        pending = connection.cart_refresh_pending = {
+            'users': set(), 'recipes': defaultdict(set),
+        }
+    return pending
+
+
+def flush_cart_refresh():
+    """
+    Выполняет накопленные за транзакцию пересчёты. Пользователи
+    с изменённой корзиной пересчитываются целиком, для изменённых
+    рецептов — только их ингредиенты у тех, у кого рецепт в корзине.
+    """
+    pending = getattr(connection, 'cart_refresh_pending', None)
+    if pending is None:
+        return
+    connection.cart_refresh_pending = None
+    users = pending['users']
+    recipes = pending['recipes']
+    partial = set()
+    ingredient_ids = set()
+    for user_id, recipe_id in Cart.objects.filter(
+        recipe__in=list(recipes)
+    ).exclude(user__in=users).values_list('user_id', 'recipe_id'):
+        partial.add(user_id)
+        ingredient_ids |= recipes[recipe_id]
+    refresh_cart_totals(users)
+    refresh_cart_totals(partial, ingredient_ids)
+
+
+def schedule_cart_refresh(user_ids=(), recipe_ingredients=None):
+    """
+    Откладывает пересчёт до фиксации транзакции: к этому моменту
+    каскадные удаления завершены, а все изменения одной транзакции
+    пересчитываются вместе. user_ids — чьи корзины изменились,
+    recipe_ingredients — {recipe_id: ingredient_ids} изменённых рецептов.
+    """
+    pending = get_pending_refresh()
+    pending['users'].update(user_ids)
+    for recipe_id, ingredient_ids in (recipe_ingredients or {}).items():
+        pending['recipes'][recipe_id].update(ingredient_ids)
+    transaction.on_commit(flush_cart_refresh)
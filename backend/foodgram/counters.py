@@ -0,0 +1,110 @@
+from functools import reduce
+from operator import or_
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Cart, Favorite, Follow, Profile, Recipe
+
+User = get_user_model()
+
+# Модель-источник: (модель со счётчиком, поле ссылки на неё, счётчик).
+COUNTERS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    Cart: (Recipe, 'recipe_id', 'in_carts_count'),
+    Follow: (Profile, 'author_id', 'followers_count'),
+    Recipe: (Profile, 'author_id', 'recipes_count'),
+}
+
+
+def get_target_id(instance):
+    return getattr(instance, COUNTERS[type(instance)][1])
+
+
+def change_counter(sender, target_ids, delta):
+    """
+    Атомарно меняет на delta счётчик строк sender у объектов target_ids.
+    У рецептов заодно отмечает время изменения для пересчёта популярности.
+    """
+    Target, _, field = COUNTERS[sender]
+    changes = {field: Greatest(F(field) + delta, 0)}
+    if Target is Recipe:
+        changes['touched_at'] = timezone.now()
+    Target.objects.filter(pk__in=target_ids).update(**changes)
+
+
+def count_subquery(sender):
+    field = COUNTERS[sender][1]
+    return Coalesce(
+        Subquery(
+            sender.objects.filter(**{field: OuterRef('pk')}).order_by(
+            ).values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0
+    )
+
+
+def actual_counters(Target):
+    return {
+        field: count_subquery(sender)
+        for sender, (model, _, field) in COUNTERS.items()
+        if model is Target
+    }
+
+
+def find_counter_drift():
+    """
+    Сравнивает счётчики с исходными таблицами.
+    Возвращает список (модель, pk, счётчик, сохранено, должно быть).
+    """
+    drift = []
+    for Target in (Recipe, Profile):
+        counters = actual_counters(Target)
+        rows = Target.objects.annotate(**{
+            f'actual_{field}': expression
+            for field, expression in counters.items()
+        }).filter(reduce(or_, (
+            ~Q(**{field: F(f'actual_{field}')}) for field in counters
+        ))).values(
+            'pk', *counters, *(f'actual_{field}' for field in counters)
+        ).order_by('pk')
+        for row in rows.iterator():
+            for field in counters:
+                if row[field] != row[f'actual_{field}']:
+                    drift.append((
+                        Target, row['pk'], field,
+                        row[field], row[f'actual_{field}']
+                    ))
+    return drift
+
+
+def find_missing_profiles():
+    return list(
+        User.objects.filter(profile__isnull=True).values_list('id', flat=True)
+    )
+
+
+@transaction.atomic
+def reconcile_counters(drift=None):
+    """
+    Создаёт недостающие профили и пересчитывает разошедшиеся счётчики.
+    """
+    missing = find_missing_profiles()
+    Profile.objects.bulk_create(
+        [Profile(user_id=user_id) for user_id in missing],
+        batch_size=1000,
+    )
+    if drift is None:
+        drift = find_counter_drift()
+    for Target in (Recipe, Profile):
+        ids = {pk for model, pk, *_ in drift if model is Target}
+        if Target is Profile:
+            ids.update(missing)
+        if ids:
+            Target.objects.filter(pk__in=ids).update(
+                **actual_counters(Target)
+            )
+    return drift
@@ -0,0 +1,195 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+
+from .cart_totals import rebuild_cart_totals
+from .counters import reconcile_counters
+from .popularity import refresh_popularity
+from .search import update_search_index
+from .management.commands.load_data import TAGS
+from .models import (Cart, Favorite, Follow, Ingredient, IngredientRecipe,
+                     Recipe, Tag, TagRecipe)
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+PASSWORD = 'foodgram-benchmark'
+IMAGE = 'foodgram/images/generated.png'
+WORDS = (
+    'салат', 'суп', 'пирог', 'рагу', 'каша', 'запеканка', 'омлет',
+    'паста', 'плов', 'котлеты', 'блины', 'оладьи', 'жаркое', 'борщ',
+)
+
+
+class DataGenerator:
+    """
+    Детерминированно по seed создаёт пользователей, рецепты, подписки,
+    избранное и списки покупок массовыми вставками.
+    """
+
+    def __init__(self, seed=0, users=10, recipes_per_author=5,
+                 ingredients_per_recipe=8, follows_per_user=5,
+                 favorites_per_user=10, carts_per_user=3,
+                 prefix='bench', days=365):
+        self.random = random.Random(seed)
+        self.users = users
+        self.recipes_per_author = recipes_per_author
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.follows_per_user = follows_per_user
+        self.favorites_per_user = favorites_per_user
+        self.carts_per_user = carts_per_user
+        self.prefix = prefix
+        self.days = days
+
+    def sample(self, population, count):
+        return self.random.sample(population, min(count, len(population)))
+
+    def ensure_ingredients(self):
+        missing = self.ingredients_per_recipe - Ingredient.objects.count()
+        if missing > 0:
+            Ingredient.objects.bulk_create(
+                [
+                    Ingredient(
+                        name=f'{self.prefix}-ингредиент-{number}',
+                        measurement_unit='г'
+                    )
+                    for number in range(missing)
+                ],
+                ignore_conflicts=True,
+            )
+        return list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+
+    def ensure_tags(self):
+        for tag in TAGS:
+            Tag.objects.get_or_create(**tag)
+        return list(Tag.objects.order_by('id').values_list('id', flat=True))
+
+    def create_users(self):
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f'{self.prefix}{number}',
+                    email=f'{self.prefix}{number}@example.com',
+                    first_name=f'Имя{number}',
+                    last_name=f'Фамилия{number}',
+                    password=password,
+                )
+                for number in range(self.users)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return list(
+            User.objects.filter(
+                username__startswith=self.prefix
+            ).order_by('id').values_list('id', flat=True)
+        )
+
+    def create_recipes(self, user_ids, tag_ids, ingredient_ids):
+        Recipe.objects.bulk_create(
+            [
+                Recipe(
+                    author_id=user_id,
+                    name=(f'{self.random.choice(WORDS).capitalize()} '
+                          f'№{number}'),
+                    text=' '.join(self.random.choices(WORDS, k=30)),
+                    cooking_time=self.random.randint(5, 180),
+                    image=IMAGE,
+                )
+                for user_id in user_ids
+                for number in range(self.recipes_per_author)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        recipes = list(
+            Recipe.objects.filter(author__in=user_ids).order_by('id').only(
+                'id', 'pub_date'
+            )
+        )
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.pub_date = now - timedelta(
+                seconds=self.random.randint(0, self.days * 24 * 60 * 60)
+            )
+        Recipe.objects.bulk_update(
+            recipes, ['pub_date'], batch_size=BATCH_SIZE
+        )
+        TagRecipe.objects.bulk_create(
+            [
+                TagRecipe(tag_id=tag_id, recipe_id=recipe.id)
+                for recipe in recipes
+                for tag_id in self.sample(
+                    tag_ids, self.random.randint(1, len(tag_ids))
+                )
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        IngredientRecipe.objects.bulk_create(
+            [
+                IngredientRecipe(
+                    ingredient_id=ingredient_id,
+                    recipe_id=recipe.id,
+                    amount=self.random.randint(1, 500),
+                )
+                for recipe in recipes
+                for ingredient_id in self.sample(
+                    ingredient_ids, self.ingredients_per_recipe
+                )
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return [recipe.id for recipe in recipes]
+
+    def create_links(self, user_ids, recipe_ids):
+        follows, favorites, carts = [], [], []
+        for user_id in user_ids:
+            authors = [
+                author_id for author_id in self.sample(
+                    user_ids, self.follows_per_user + 1
+                )
+                if author_id != user_id
+            ][:self.follows_per_user]
+            follows.extend(
+                Follow(user_id=user_id, author_id=author_id)
+                for author_id in authors
+            )
+            favorites.extend(
+                Favorite(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in self.sample(
+                    recipe_ids, self.favorites_per_user
+                )
+            )
+            carts.extend(
+                Cart(user_id=user_id, recipe_id=recipe_id)
+                for recipe_id in self.sample(recipe_ids, self.carts_per_user)
+            )
+        Follow.objects.bulk_create(follows, batch_size=BATCH_SIZE)
+        Favorite.objects.bulk_create(favorites, batch_size=BATCH_SIZE)
+        Cart.objects.bulk_create(carts, batch_size=BATCH_SIZE)
+        return len(follows), len(favorites), len(carts)
+
+    def generate(self):
+        """
+        Создаёт данные и возвращает количество созданных объектов.
+        """
+        ingredient_ids = self.ensure_ingredients()
+        tag_ids = self.ensure_tags()
+        user_ids = self.create_users()
+        recipe_ids = self.create_recipes(user_ids, tag_ids, ingredient_ids)
+        follows, favorites, carts = self.create_links(user_ids, recipe_ids)
+        rebuild_cart_totals()
+        reconcile_counters()
+        refresh_popularity()
+        update_search_index(recipe_ids)
+        return {
+            'users': len(user_ids),
+            'recipes': len(recipe_ids),
+            'follows': follows,
+            'favorites': favorites,
+            'carts': carts,
+        }
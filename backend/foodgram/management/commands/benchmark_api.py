@@ -0,0 +1,183 @@
+import json
+import logging
+import statistics
+import subprocess
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import (setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.test import APIClient
+
+from foodgram.benchmarking import (add_generator_arguments,
+                                   generator_options, isolated_cache,
+                                   percentile)
+from foodgram.data_generator import DataGenerator
+from foodgram.models import Follow, Recipe
+
+User = get_user_model()
+
+DEFAULT_SIZES = (10, 100, 1000)
+ENDPOINTS = {
+    'recipes': '/api/recipes/',
+    'recipes_last_page': '/api/recipes/?page={last_page}',
+    'recipes_by_tags': '/api/recipes/?tags=breakfast&tags=dinner',
+    'recipes_favorited': '/api/recipes/?is_favorited=1',
+    'recipe_detail': '/api/recipes/{recipe_id}/',
+    'users': '/api/users/',
+    'subscriptions': '/api/users/subscriptions/?recipes_limit=3',
+    'download_shopping_cart': '/api/recipes/download_shopping_cart/',
+    'feed': '/api/recipes/feed/',
+    'feed_next_page': '{feed_next_page}',
+}
+# Эндпоинты ленты запрашивает отдельный пользователь, подписанный
+# на всех авторов набора данных.
+FEED_ENDPOINTS = ('feed', 'feed_next_page')
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Генерирует данные разного объёма в тестовой базе и замеряет '
+            'задержку и количество SQL-запросов эндпоинтов API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+            help='Количество пользователей в наборах данных.'
+        )
+        parser.add_argument(
+            '--requests', type=int, default=20,
+            help='Количество замеров на каждый эндпоинт.'
+        )
+        parser.add_argument(
+            '--endpoints', nargs='+', choices=ENDPOINTS,
+            default=list(ENDPOINTS),
+        )
+        parser.add_argument(
+            '--output', help='Файл для сохранения результатов в JSON.'
+        )
+        add_generator_arguments(parser)
+
+    @staticmethod
+    def request(client, path):
+        response = client.get(path)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, path, count):
+        self.request(client, path)
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count_query):
+            response = self.request(client, path)
+        timings = []
+        for _ in range(count):
+            start = time.perf_counter()
+            self.request(client, path)
+            timings.append((time.perf_counter() - start) * 1000)
+        return {
+            'status': response.status_code,
+            'queries': len(queries),
+            'p50': percentile(timings, 50),
+            'p95': percentile(timings, 95),
+            'p99': percentile(timings, 99),
+            'mean': statistics.mean(timings),
+        }
+
+    @staticmethod
+    def create_feed_reader():
+        user = User.objects.create_user(
+            username='bench-feed-reader', email='bench-feed-reader@example.com'
+        )
+        Follow.objects.bulk_create(
+            Follow(user=user, author_id=author_id)
+            for author_id in Recipe.objects.order_by().values_list(
+                'author_id', flat=True
+            ).distinct()
+        )
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def run_size(self, size, options):
+        # Каждый набор данных замеряется с пустого кеша.
+        cache.clear()
+        generator = DataGenerator(users=size, **generator_options(options))
+        generator.generate()
+        recipe = Recipe.objects.order_by('id').first()
+        context = {
+            'recipe_id': recipe.id,
+            'last_page': max(1, -(-Recipe.objects.count() // 6)),
+        }
+        client = APIClient()
+        client.force_authenticate(recipe.author)
+        reader = self.create_feed_reader()
+        context['feed_next_page'] = reader.get(
+            ENDPOINTS['feed']
+        ).data['next'] or ENDPOINTS['feed']
+        results = []
+        for name in options['endpoints']:
+            path = ENDPOINTS[name].format(**context)
+            result = self.measure(
+                reader if name in FEED_ENDPOINTS else client,
+                path,
+                options['requests']
+            )
+            result.update(size=size, endpoint=name)
+            results.append(result)
+            self.stdout.write(
+                f'{size:>8}  {name:<24}{result["status"]:>5}'
+                f'{result["queries"]:>9}{result["p50"]:>10.2f}'
+                f'{result["p95"]:>10.2f}{result["p99"]:>10.2f}'
+            )
+        return results
+
+    @isolated_cache()
+    def handle(self, *args, **options):
+        logging.getLogger('api.sql').setLevel(logging.WARNING)
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True
+        )
+        results = []
+        try:
+            self.stdout.write(
+                f'{"size":>8}  {"endpoint":<24}{"code":>5}{"queries":>9}'
+                f'{"p50, ms":>10}{"p95, ms":>10}{"p99, ms":>10}'
+            )
+            for size in options['sizes']:
+                with transaction.atomic():
+                    results.extend(self.run_size(size, options))
+                    transaction.set_rollback(True)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(
+                    {
+                        'commit': get_commit(),
+                        'options': generator_options(options),
+                        'results': results,
+                    },
+                    output,
+                    ensure_ascii=False,
+                    indent=2,
+                )
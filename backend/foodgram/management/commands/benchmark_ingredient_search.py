@@ -0,0 +1,74 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.ingredient_index import ingredient_index
+from foodgram.benchmarking import percentile
+from foodgram.models import Ingredient
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает задержку поиска ингредиентов по префиксу: '
+            'индекс в памяти против запроса к базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', type=int, default=1000,
+            help='Количество поисковых запросов.'
+        )
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def make_prefixes(self, count, seed):
+        names = list(Ingredient.objects.values_list('name', flat=True))
+        if not names:
+            raise CommandError(
+                'Таблица ингредиентов пуста, выполните load_data.'
+            )
+        generator = random.Random(seed)
+        return [
+            generator.choice(names)[:generator.randint(1, 4)]
+            for _ in range(count)
+        ]
+
+    @staticmethod
+    def search_orm(prefix, limit):
+        queryset = Ingredient.objects.filter(name__istartswith=prefix)
+        if limit:
+            queryset = queryset[:limit]
+        return list(queryset)
+
+    @staticmethod
+    def search_index(prefix, limit):
+        return ingredient_index.search(prefix, limit)
+
+    @staticmethod
+    def measure(search, prefixes, limit):
+        timings = []
+        for prefix in prefixes:
+            start = time.perf_counter()
+            search(prefix, limit)
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings
+
+    def handle(self, *args, **options):
+        prefixes = self.make_prefixes(options['queries'], options['seed'])
+        start = time.perf_counter()
+        ingredient_index.ensure_fresh()
+        self.stdout.write(
+            f'Построение индекса: '
+            f'{(time.perf_counter() - start) * 1000:.1f} ms'
+        )
+        self.stdout.write(
+            f'{"path":<8}{"p50, ms":>10}{"p99, ms":>10}{"mean, ms":>10}'
+        )
+        for label, search in (('orm', self.search_orm),
+                              ('index', self.search_index)):
+            timings = self.measure(search, prefixes, options['limit'])
+            self.stdout.write(
+                f'{label:<8}{percentile(timings, 50):>10.3f}'
+                f'{percentile(timings, 99):>10.3f}'
+                f'{statistics.mean(timings):>10.3f}'
+            )
@@ -0,0 +1,113 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+
+from api.pantry_index import MAX_RESULTS, pantry_index
+from foodgram.benchmarking import percentile
+from foodgram.models import IngredientRecipe
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает поиск рецептов по имеющимся ингредиентам: '
+            'инвертированный индекс в памяти против GROUP BY в базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--queries', type=int, default=200,
+            help='Количество поисковых запросов.'
+        )
+        parser.add_argument(
+            '--pantry-size', type=int, default=10,
+            help='Количество ингредиентов в одном запросе.'
+        )
+        parser.add_argument(
+            '--missing', type=int, default=None,
+            help='Сколько ингредиентов может не хватать.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+
+    def make_pantries(self, count, size, seed):
+        ingredient_ids = list(
+            IngredientRecipe.objects.order_by().values_list(
+                'ingredient_id', flat=True
+            ).distinct()
+        )
+        if not ingredient_ids:
+            raise CommandError(
+                'Рецептов с ингредиентами нет, выполните generate_data.'
+            )
+        generator = random.Random(seed)
+        return [
+            generator.sample(ingredient_ids, min(size, len(ingredient_ids)))
+            for _ in range(count)
+        ]
+
+    @staticmethod
+    def search_sql(ingredient_ids, max_missing):
+        rows = IngredientRecipe.objects.order_by().values('recipe').annotate(
+            total=Count('id'),
+            matched=Count('id', filter=Q(ingredient__in=ingredient_ids)),
+        ).filter(matched__gt=0).annotate(
+            missing=F('total') - F('matched'),
+            coverage=Cast('matched', FloatField()) / F('total'),
+        )
+        if max_missing is not None:
+            rows = rows.filter(missing__lte=max_missing)
+        return [
+            (row['recipe'], row['coverage'], row['missing'])
+            for row in rows.order_by(
+                '-coverage', 'missing', '-recipe_id'
+            )[:MAX_RESULTS]
+        ]
+
+    @staticmethod
+    def search_index(ingredient_ids, max_missing):
+        return pantry_index.search(ingredient_ids, max_missing)
+
+    @staticmethod
+    def measure(search, pantries, max_missing):
+        timings = []
+        results = []
+        for pantry in pantries:
+            start = time.perf_counter()
+            results.append(search(pantry, max_missing))
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, results
+
+    def handle(self, *args, **options):
+        pantries = self.make_pantries(
+            options['queries'], options['pantry_size'], options['seed']
+        )
+        start = time.perf_counter()
+        pantry_index.ensure_fresh()
+        self.stdout.write(
+            f'Построение индекса: '
+            f'{(time.perf_counter() - start) * 1000:.1f} ms'
+        )
+        self.stdout.write(
+            f'{"path":<8}{"p50, ms":>10}{"p99, ms":>10}{"mean, ms":>10}'
+        )
+        results = {}
+        for label, search in (('sql', self.search_sql),
+                              ('index', self.search_index)):
+            timings, results[label] = self.measure(
+                search, pantries, options['missing']
+            )
+            self.stdout.write(
+                f'{label:<8}{percentile(timings, 50):>10.3f}'
+                f'{percentile(timings, 99):>10.3f}'
+                f'{statistics.mean(timings):>10.3f}'
+            )
+        mismatches = sum(
+            sql != index
+            for sql, index in zip(results['sql'], results['index'])
+        )
+        if mismatches:
+            raise CommandError(
+                f'Результаты расходятся в {mismatches} запросах.'
+            )
+        self.stdout.write(self.style.SUCCESS('Результаты совпадают.'))
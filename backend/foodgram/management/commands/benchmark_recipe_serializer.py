@@ -0,0 +1,115 @@
+import statistics
+import time
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import FastRecipeSerializer
+from api.serializers import RecipeSerializer
+from api.views import RecipeViewSet
+from foodgram.benchmarking import isolated_cache, percentile
+from foodgram.models import Favorite
+
+
+class Command(BaseCommand):
+    help = ('Проверяет, что FastRecipeSerializer отдаёт тот же JSON, '
+            'что RecipeSerializer, с пустым и заполненным кешем рецептов, '
+            'и сравнивает их время на страницах списка рецептов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument(
+            '--pages', type=int, default=10,
+            help='Количество проверяемых страниц.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество замеров на каждую страницу.'
+        )
+
+    @staticmethod
+    def make_view(user):
+        request = Request(APIRequestFactory().get('/api/recipes/'))
+        request.user = user
+        view = RecipeViewSet(
+            request=request, action='list', format_kwarg=None, kwargs={}
+        )
+        return view
+
+    @staticmethod
+    def render_reference(view, offset, size):
+        page = list(view.get_queryset().order_by('-pub_date', '-id')[
+            offset:offset + size
+        ])
+        serializer = RecipeSerializer(
+            page, many=True, context=view.get_serializer_context()
+        )
+        return JSONRenderer().render(serializer.data)
+
+    @staticmethod
+    def render_fast(view, offset, size):
+        rows = view.get_queryset().prefetch_related(None).values(
+            *FastRecipeSerializer.values_fields
+        ).order_by('-pub_date', '-id')[offset:offset + size]
+        serializer = FastRecipeSerializer(
+            rows, context=view.get_serializer_context()
+        )
+        return JSONRenderer().render(serializer.data)
+
+    @staticmethod
+    def measure(render, view, offsets, size, repeat, cold=False):
+        wall, cpu = [], []
+        for offset in offsets:
+            for _ in range(repeat):
+                if cold:
+                    cache.clear()
+                wall_start = time.perf_counter()
+                cpu_start = time.process_time()
+                render(view, offset, size)
+                cpu.append((time.process_time() - cpu_start) * 1000)
+                wall.append((time.perf_counter() - wall_start) * 1000)
+        return wall, cpu
+
+    @isolated_cache()
+    def handle(self, *args, **options):
+        setup_test_environment()
+        favorite = Favorite.objects.select_related('user').first()
+        if favorite is None:
+            raise CommandError(
+                'Нет данных для проверки, выполните generate_data.'
+            )
+        size = options['page_size']
+        offsets = [page * size for page in range(options['pages'])]
+        for user in (favorite.user, AnonymousUser()):
+            view = self.make_view(user)
+            for offset in offsets:
+                reference = self.render_reference(view, offset, size)
+                cache.clear()
+                for state in ('cold', 'warm'):
+                    if reference != self.render_fast(view, offset, size):
+                        raise CommandError(
+                            f'JSON расходится ({state}): пользователь '
+                            f'{user.pk}, смещение {offset}.'
+                        )
+        self.stdout.write(self.style.SUCCESS('JSON совпадает.'))
+        view = self.make_view(favorite.user)
+        self.stdout.write(
+            f'{"path":<12}{"p50, ms":>10}{"p99, ms":>10}{"cpu, ms":>10}'
+        )
+        for label, render, cold in (
+            ('reference', self.render_reference, False),
+            ('fast cold', self.render_fast, True),
+            ('fast warm', self.render_fast, False),
+        ):
+            wall, cpu = self.measure(
+                render, view, offsets, size, options['repeat'], cold
+            )
+            self.stdout.write(
+                f'{label:<12}{percentile(wall, 50):>10.2f}'
+                f'{percentile(wall, 99):>10.2f}{statistics.mean(cpu):>10.2f}'
+            )
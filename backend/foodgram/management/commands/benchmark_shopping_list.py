@@ -0,0 +1,63 @@
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from api.shopping_list import RENDERERS
+
+DEFAULT_SIZES = (10, 100, 1000)
+
+
+class Command(BaseCommand):
+    help = 'Замеряет время и пиковую память рендеринга списка покупок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', type=int, default=DEFAULT_SIZES,
+            help='Количество ингредиентов в корзине.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=3,
+            help='Количество повторов, берётся лучшее время.'
+        )
+
+    @staticmethod
+    def make_ingredients(size):
+        return [
+            {
+                'name': f'Ингредиент {number}',
+                'measurement_unit': 'г',
+                'total_amount': number,
+            }
+            for number in range(size)
+        ]
+
+    @staticmethod
+    def measure(render, ingredients):
+        tracemalloc.start()
+        start = time.perf_counter()
+        total_bytes = sum(len(chunk) for chunk in render(iter(ingredients)))
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return elapsed, peak, total_bytes
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"format":<8}{"size":>8}{"time, ms":>12}'
+            f'{"peak, KiB":>12}{"output, KiB":>14}'
+        )
+        for file_format, (render, _) in RENDERERS.items():
+            for size in options['sizes']:
+                ingredients = self.make_ingredients(size)
+                results = [
+                    self.measure(render, ingredients)
+                    for _ in range(options['repeat'])
+                ]
+                elapsed = min(result[0] for result in results)
+                peak = max(result[1] for result in results)
+                total_bytes = results[0][2]
+                self.stdout.write(
+                    f'{file_format:<8}{size:>8}{elapsed * 1000:>12.1f}'
+                    f'{peak / 1024:>12.1f}{total_bytes / 1024:>14.1f}'
+                )
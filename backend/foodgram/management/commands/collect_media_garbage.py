@@ -0,0 +1,87 @@
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.images import recipe_storage, thumbnail_name
+from foodgram.models import Recipe
+
+IMAGES_DIR = Recipe._meta.get_field('image').upload_to
+THUMBNAILS_DIR = os.path.join(IMAGES_DIR, 'thumbnails')
+
+
+class Command(BaseCommand):
+    help = ('Удаляет из MEDIA_ROOT картинки рецептов и превью, '
+            'на которые не ссылается ни один рецепт.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать файлы, которые будут удалены.'
+        )
+        parser.add_argument(
+            '--grace-seconds', type=int,
+            default=settings.IMAGE_PIPELINE['GC_GRACE_SECONDS'],
+            help='Не трогать файлы моложе указанного возраста: '
+                 'они могут принадлежать ещё не сохранённому рецепту.'
+        )
+
+    @staticmethod
+    def list_files(storage, directory):
+        if not storage.exists(directory):
+            return []
+        _, files = storage.listdir(directory)
+        return [os.path.join(directory, name) for name in files]
+
+    def handle(self, *args, **options):
+        referenced = set(
+            Recipe.objects.exclude(image='').values_list('image', flat=True)
+        )
+        thumbnails = {
+            thumbnail_name(name, size)
+            for name in referenced
+            for size in settings.IMAGE_PIPELINE['THUMBNAIL_SIZES']
+        }
+        deadline = timezone.now() - timezone.timedelta(
+            seconds=options['grace_seconds']
+        )
+        images = self.list_files(recipe_storage, IMAGES_DIR)
+        # Превью картинки, загруженной повторно в пределах grace-периода,
+        # тоже не трогаем: её рецепт может быть ещё не сохранён.
+        recent = {
+            thumbnail_name(name, size)
+            for name in images
+            if recipe_storage.get_modified_time(name) > deadline
+            for size in settings.IMAGE_PIPELINE['THUMBNAIL_SIZES']
+        }
+        candidates = [
+            (recipe_storage, name)
+            for name in images
+            if name not in referenced
+        ] + [
+            (default_storage, name)
+            for name in self.list_files(default_storage, THUMBNAILS_DIR)
+            if name not in thumbnails and name not in recent
+        ]
+        removed = freed = 0
+        for storage, name in candidates:
+            # Ссылки и возраст проверяются ещё раз под блокировкой: файл
+            # могли переиспользовать после того, как собран список.
+            with recipe_storage.lock():
+                if (not storage.exists(name)
+                        or storage.get_modified_time(name) > deadline
+                        or storage is recipe_storage
+                        and Recipe.objects.filter(image=name).exists()):
+                    continue
+                size = storage.size(name)
+                self.stdout.write(f'{name} ({size} байт)')
+                if not options['dry_run']:
+                    storage.delete(name)
+            removed += 1
+            freed += size
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} файлов: {removed}, {freed / 1024:.1f} КиБ'
+        ))
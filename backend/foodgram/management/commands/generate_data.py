@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.benchmarking import add_generator_arguments, generator_options
+from foodgram.data_generator import DataGenerator
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетические данные для нагрузочного тестирования.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        add_generator_arguments(parser)
+
+    def handle(self, *args, **options):
+        if User.objects.filter(
+            username__startswith=options['prefix']
+        ).exists():
+            raise CommandError(
+                f'Пользователи с префиксом "{options["prefix"]}" уже есть, '
+                'укажите другой --prefix.'
+            )
+        counts = DataGenerator(
+            users=options['users'], **generator_options(options)
+        ).generate()
+        self.stdout.write(self.style.SUCCESS(
+            ', '.join(f'{name}: {count}' for name, count in counts.items())
+        ))
@@ -1,53 +1,137 @@
 import csv
+import json
 import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 
-from foodgram.models import Ingredient, Tag
+from api.cache import bump_recipe_versions, bump_table_version
+from foodgram.models import Ingredient, Recipe, Tag
 
+DATA_FILE = os.path.join(settings.BASE_DIR, 'ingredients.csv')
+BATCH_SIZE = 1000
+TAGS = (
+    {'name': 'Завтрак', 'slug': 'breakfast', 'color': '#ADFF2F'},
+    {'name': 'Обед', 'slug': 'dinner', 'color': '#6A5ACD'},
+    {'name': 'Ужин', 'slug': 'supper', 'color': '#800000'},
+)
 
-BASE_DIR = os.path.dirname(os.getcwd())
-DATA_FILE = 'ingredients.csv'
+
+def read_csv(path):
+    with open(path, encoding='utf-8') as data_file:
+        reader = csv.reader(data_file)
+        for row in reader:
+            if not any(cell.strip() for cell in row):
+                continue
+            if len(row) < 2 or not row[0].strip():
+                raise CommandError(
+                    f'{path}, строка {reader.line_num}: ожидались название '
+                    f'и единица измерения, получено {row}'
+                )
+            yield row[0], row[1]
+
+
+def read_json(path):
+    with open(path, encoding='utf-8') as data_file:
+        for element in json.load(data_file):
+            yield element['name'], element['measurement_unit']
+
+
+READERS = {'.csv': read_csv, '.json': read_json}
+
+
+def batches(rows, size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, size))
+        if not batch:
+            return
+        yield batch
 
 
 class Command(BaseCommand):
-    def import_from_csv_file(self):
-        data_folder = os.path.join(f'{BASE_DIR}/app/')
-        print('!!!!', data_folder)
-        with open(os.path.join(data_folder, DATA_FILE),
-                  encoding='utf-8') as data_file:
-            data = csv.reader(data_file)
-            for data_object in data:
-                name = data_object[0]
-                measurement_unit = data_object[1]
-
-                try:
-                    ingredient, created = Ingredient.objects.get_or_create(
-                        name=name,
-                        measurement_unit=measurement_unit,
-                    )
-                    if created:
-                        ingredient.save()
-                        display_format = "\nИнгредиент, {}, сохранён."
-                        print(display_format.format(ingredient))
-                except Exception as ex:
-                    print(str(ex))
-                    msg = ("\n\nЧто-то пошло не так при сохранении"
-                           " ингредиента: {}\n{}".format(name, str(ex)))
-                    print(msg)
-
-        Tag.objects.get_or_create(name='Завтрак',
-                                  slug='breakfast',
-                                  color='#ADFF2F')
-        Tag.objects.get_or_create(name='Обед',
-                                  slug='dinner',
-                                  color='#6A5ACD')
-        Tag.objects.get_or_create(name='Ужин',
-                                  slug='supper',
-                                  color='#800000')
+    help = 'Загружает ингредиенты из csv/json-файлов и создаёт базовые теги.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*', default=[DATA_FILE],
+            help='Пути к файлам .csv или .json '
+                 '(по умолчанию ingredients.csv в папке backend).'
+        )
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    @staticmethod
+    @transaction.atomic
+    def import_batch(batch):
+        """
+        Вставляет новые ингредиенты и обновляет единицы измерения
+        существующих; bulk_update обходит сигналы, поэтому кеш рецептов
+        с этими ингредиентами сбрасывается здесь.
+        Возвращает (добавлено, обновлено, пропущено).
+        """
+        rows = dict(batch)
+        existing = {
+            ingredient.name: ingredient
+            for ingredient in Ingredient.objects.filter(name__in=rows)
+        }
+        to_create = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in rows.items()
+            if name not in existing
+        ]
+        to_update = []
+        for name, ingredient in existing.items():
+            if ingredient.measurement_unit != rows[name]:
+                ingredient.measurement_unit = rows[name]
+                to_update.append(ingredient)
+        Ingredient.objects.bulk_create(to_create, ignore_conflicts=True)
+        Ingredient.objects.bulk_update(to_update, ['measurement_unit'])
+        if to_update:
+            bump_recipe_versions(Recipe.objects.filter(
+                ingredient_recipes__ingredient__in=to_update
+            ))
+        return (
+            len(to_create),
+            len(to_update),
+            len(batch) - len(to_create) - len(to_update),
+        )
+
+    def import_file(self, path, batch_size):
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(f'Неподдерживаемый формат файла: {path}')
+        if not os.path.isfile(path):
+            raise CommandError(f'Файл не найден: {path}')
+        totals = [0, 0, 0]
+        for batch in batches(reader(path), batch_size):
+            for position, count in enumerate(self.import_batch(batch)):
+                totals[position] += count
+        return totals
 
     def handle(self, *args, **options):
         """
-        Вызывает функцию импорта данных из csv
+        Вызывает функцию импорта данных из csv/json
         """
-        self.import_from_csv_file()
+        start = time.perf_counter()
+        inserted = updated = skipped = 0
+        for path in options['paths']:
+            file_inserted, file_updated, file_skipped = self.import_file(
+                path, options['batch_size']
+            )
+            inserted += file_inserted
+            updated += file_updated
+            skipped += file_skipped
+            self.stdout.write(
+                f'{path}: добавлено {file_inserted}, '
+                f'обновлено {file_updated}, пропущено {file_skipped}'
+            )
+        bump_table_version('ingredient')
+        for tag in TAGS:
+            Tag.objects.get_or_create(**tag)
+        self.stdout.write(self.style.SUCCESS(
+            f'Итого: добавлено {inserted}, обновлено {updated}, '
+            f'пропущено {skipped} за {time.perf_counter() - start:.2f} с'
+        ))
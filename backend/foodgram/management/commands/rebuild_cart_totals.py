@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from foodgram.cart_totals import (aggregate_cart_totals, lock_profiles,
+                                  rebuild_cart_totals)
+from foodgram.models import CartIngredientTotal
+
+
+class Command(BaseCommand):
+    help = ('Пересобирает суммы ингредиентов в списках покупок '
+            'или проверяет их расхождение с исходными данными.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить, ничего не изменяя.'
+        )
+
+    def find_mismatches(self, expected):
+        stored = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount
+            in CartIngredientTotal.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            ).iterator()
+        }
+        return {
+            key: (stored.get(key), expected.get(key))
+            for key in stored.keys() | expected.keys()
+            if stored.get(key) != expected.get(key)
+        }
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if not options['verify']:
+            lock_profiles()
+        expected = aggregate_cart_totals()
+        mismatches = self.find_mismatches(expected)
+        for (user_id, ingredient_id), (stored, actual) in sorted(
+            mismatches.items()
+        ):
+            self.stdout.write(
+                f'user={user_id} ingredient={ingredient_id}: '
+                f'сохранено {stored}, должно быть {actual}'
+            )
+        if options['verify']:
+            if mismatches:
+                raise CommandError(
+                    f'Найдено расхождений: {len(mismatches)}.'
+                )
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        rebuild_cart_totals(expected)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано записей: {len(expected)}, '
+            f'исправлено расхождений: {len(mismatches)}.'
+        ))
@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.search import update_search_index
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает поисковые документы всех рецептов.'
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        update_search_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс пересобран за '
+            f'{time.perf_counter() - start:.2f} с.'
+        ))
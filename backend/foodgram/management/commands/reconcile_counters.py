@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from foodgram.counters import (find_counter_drift, find_missing_profiles,
+                               reconcile_counters)
+
+
+class Command(BaseCommand):
+    help = ('Сверяет счётчики рецептов и профилей с исходными таблицами '
+            'и исправляет расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить, ничего не изменяя.'
+        )
+
+    def handle(self, *args, **options):
+        missing = find_missing_profiles()
+        drift = find_counter_drift()
+        if missing:
+            self.stdout.write(f'Пользователей без профиля: {len(missing)}')
+        for model, pk, field, stored, actual in drift:
+            self.stdout.write(
+                f'{model._meta.model_name}={pk} {field}: '
+                f'сохранено {stored}, должно быть {actual}'
+            )
+        if options['verify']:
+            if missing or drift:
+                raise CommandError(
+                    f'Найдено расхождений: {len(drift)}, '
+                    f'профилей не хватает: {len(missing)}.'
+                )
+            self.stdout.write(self.style.SUCCESS('Расхождений нет.'))
+            return
+        reconcile_counters(drift)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано профилей: {len(missing)}, '
+            f'исправлено счётчиков: {len(drift)}.'
+        ))
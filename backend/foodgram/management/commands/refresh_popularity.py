@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from foodgram.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает популярность рецептов по избранному и спискам '
+            'покупок с затуханием по времени.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help=('Пересчитать только рецепты, у которых счётчики менялись '
+                  'после прошлого запуска.')
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        updated = refresh_popularity(
+            incremental=options['incremental'],
+            batch_size=options['batch_size'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено рецептов: {updated} '
+            f'за {time.perf_counter() - start:.2f} с.'
+        ))
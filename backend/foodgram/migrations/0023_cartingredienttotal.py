@@ -0,0 +1,53 @@
+# Generated by Django 4.1 on 2026-10-18 18:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def fill_cart_totals(apps, schema_editor):
+    IngredientRecipe = apps.get_model('foodgram', 'IngredientRecipe')
+    CartIngredientTotal = apps.get_model('foodgram', 'CartIngredientTotal')
+    rows = IngredientRecipe.objects.filter(
+        recipe__in_cart__isnull=False
+    ).values('recipe__in_cart__user', 'ingredient').annotate(
+        total=Sum('amount')
+    ).order_by()
+    CartIngredientTotal.objects.bulk_create(
+        CartIngredientTotal(
+            user_id=row['recipe__in_cart__user'],
+            ingredient_id=row['ingredient'],
+            total_amount=row['total'],
+        )
+        for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('foodgram', '0022_rename_favorites_favorite'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CartIngredientTotal',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField()),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_totals', to='foodgram.ingredient')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cart_ingredient_totals', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Сумма ингредиента в списке покупок',
+                'verbose_name_plural': 'Суммы ингредиентов в списках покупок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='cartingredienttotal',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_user_ingredient_total'),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.1 on 2026-10-18 18:57
+
+from django.db import migrations, models
+import foodgram.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0024_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(db_index=True, storage=foodgram.storage.ContentAddressedStorage(), upload_to='foodgram/images/', verbose_name='Картинка, закодированная в Base64'),
+        ),
+    ]
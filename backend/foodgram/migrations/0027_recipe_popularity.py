@@ -0,0 +1,55 @@
+# Generated by Django 4.1 on 2026-10-18 19:04
+
+import math
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_popularity(apps, schema_editor):
+    Recipe = apps.get_model('foodgram', 'Recipe')
+    config = settings.POPULARITY
+    recipes = []
+    for recipe in Recipe.objects.only(
+        'pub_date', 'favorites_count', 'in_carts_count'
+    ).iterator():
+        weight = (
+            recipe.favorites_count * config['FAVORITE_WEIGHT']
+            + recipe.in_carts_count * config['CART_WEIGHT']
+        )
+        recipe.popularity = (
+            math.log2(1 + weight)
+            + recipe.pub_date.timestamp() / (config['HALF_LIFE_HOURS'] * 3600)
+        )
+        recipes.append(recipe)
+    Recipe.objects.bulk_update(recipes, ['popularity'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0026_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity',
+            field=models.FloatField(default=0, verbose_name='Популярность'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='popularity_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Пересчёт популярности'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='touched_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Изменение счётчиков'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['popularity', 'id'], name='recipe_popularity_id_idx'),
+        ),
+        migrations.RunPython(fill_popularity, migrations.RunPython.noop),
+    ]
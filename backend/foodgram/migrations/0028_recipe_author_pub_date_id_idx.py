@@ -0,0 +1,17 @@
+# Generated by Django 4.1 on 2026-10-18 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0027_recipe_popularity'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', 'pub_date', 'id'], name='recipe_author_pub_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 4.1 on 2026-10-18 19:10
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+FTS_TABLE = 'foodgram_recipe_fts'
+INGREDIENT_NAMES = (
+    "(SELECT {aggregate} FROM foodgram_ingredientrecipe ir "
+    "JOIN foodgram_ingredient i ON i.id = ir.ingredient_id "
+    "WHERE ir.recipe_id = foodgram_recipe.id)"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx ON foodgram_recipe '
+            'USING gin (search_vector)'
+        )
+        names = INGREDIENT_NAMES.format(aggregate="string_agg(i.name, ' ')")
+        schema_editor.execute(
+            'UPDATE foodgram_recipe SET search_vector = '
+            "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+            f"setweight(to_tsvector('russian', coalesce({names}, '')), 'B') || "
+            "setweight(to_tsvector('russian', coalesce(text, '')), 'C')"
+        )
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {FTS_TABLE} '
+            'USING fts5(name, ingredients, text)'
+        )
+        names = INGREDIENT_NAMES.format(aggregate="group_concat(i.name, ' ')")
+        schema_editor.execute(
+            f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+            f"SELECT id, name, coalesce({names}, ''), text "
+            'FROM foodgram_recipe'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX recipe_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0028_recipe_author_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый документ'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0029_recipe_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='cache_version',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Версия кеша'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.1 on 2026-10-18 20:13
+
+import time
+
+from django.db import migrations, models
+
+
+def seed_cache_versions(apps, schema_editor):
+    Recipe = apps.get_model('foodgram', 'Recipe')
+    Recipe.objects.filter(cache_version=0).update(
+        cache_version=time.time_ns()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('foodgram', '0030_recipe_cache_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='cache_version',
+            field=models.BigIntegerField(default=time.time_ns, editable=False, verbose_name='Версия кеша'),
+        ),
+        migrations.RunPython(seed_cache_versions, migrations.RunPython.noop),
+    ]
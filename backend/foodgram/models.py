@@ -1,7 +1,12 @@
+import time
+
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -33,6 +38,31 @@ class Tag(models.Model):
         return self.name
 
 
+class Profile(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='profile',
+        verbose_name='Пользователь',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Подписчиков',
+    )
+
+    class Meta:
+        verbose_name = 'Профиль'
+        verbose_name_plural = 'Профили'
+
+    def __str__(self):
+        return str(self.user)
+
+
 class Ingredient(models.Model):
     name = models.CharField(
         max_length=200,
@@ -65,6 +95,8 @@ class Recipe(models.Model):
     )
     image = models.ImageField(
         upload_to='foodgram/images/',
+        storage=ContentAddressedStorage(),
+        db_index=True,
         verbose_name='Картинка, закодированная в Base64',
     )
     text = models.TextField(verbose_name='Описание',)
@@ -84,11 +116,59 @@ class Recipe(models.Model):
         verbose_name='Время приготовления в мин',
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В избранном',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='В списках покупок',
+    )
+    popularity = models.FloatField(
+        default=0,
+        verbose_name='Популярность',
+    )
+    touched_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Изменение счётчиков',
+    )
+    popularity_updated_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Пересчёт популярности',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый документ',
+    )
+    # Начальная версия уникальна, чтобы рецепт с тем же id из другой базы
+    # (тестовой, пересозданной) не читал чужие документы из общего кеша.
+    cache_version = models.BigIntegerField(
+        default=time.time_ns,
+        editable=False,
+        verbose_name='Версия кеша',
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(
+                fields=['pub_date', 'id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['popularity', 'id'],
+                name='recipe_popularity_id_idx'
+            ),
+            models.Index(
+                fields=['author', 'pub_date', 'id'],
+                name='recipe_author_pub_date_id_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -224,3 +304,30 @@ class Cart(models.Model):
 
     def __str__(self):
         return f'{self.user} {self.recipe}'
+
+
+class CartIngredientTotal(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_ingredient_totals',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='cart_totals',
+    )
+    total_amount = models.PositiveIntegerField()
+
+    class Meta:
+        verbose_name = 'Сумма ингредиента в списке покупок'
+        verbose_name_plural = 'Суммы ингредиентов в списках покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient_total'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient} {self.total_amount}'
@@ -0,0 +1,64 @@
+import math
+
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Recipe
+
+config = settings.POPULARITY
+
+
+def popularity_score(pub_date, favorites_count=0, in_carts_count=0):
+    """
+    log2(1 + вес) + время публикации в периодах полураспада.
+    Порядок по такой оценке совпадает с порядком по весу, который
+    затухает вдвое за каждый период, но сама оценка от текущего
+    времени не зависит и пересчитывается только при изменении счётчиков.
+    """
+    weight = (
+        favorites_count * config['FAVORITE_WEIGHT']
+        + in_carts_count * config['CART_WEIGHT']
+    )
+    return (
+        math.log2(1 + weight)
+        + pub_date.timestamp() / (config['HALF_LIFE_HOURS'] * 3600)
+    )
+
+
+def refresh_popularity(incremental=False, batch_size=1000):
+    """
+    Пересчитывает популярность всех рецептов или, в режиме incremental,
+    только тех, чьи счётчики менялись после прошлого пересчёта.
+    Возвращает количество обновлённых рецептов.
+    """
+    started = timezone.now()
+    recipes = Recipe.objects.order_by()
+    if incremental:
+        recipes = recipes.filter(
+            Q(popularity_updated_at__isnull=True)
+            | Q(touched_at__gte=F('popularity_updated_at'))
+        )
+    rows = recipes.values_list(
+        'id', 'pub_date', 'favorites_count', 'in_carts_count'
+    ).iterator(chunk_size=batch_size)
+    batch = []
+    updated = 0
+    for recipe_id, pub_date, favorites_count, in_carts_count in rows:
+        batch.append(Recipe(
+            id=recipe_id,
+            popularity=popularity_score(
+                pub_date, favorites_count, in_carts_count
+            ),
+            popularity_updated_at=started,
+        ))
+        if len(batch) == batch_size:
+            updated += Recipe.objects.bulk_update(
+                batch, ['popularity', 'popularity_updated_at']
+            )
+            batch = []
+    if batch:
+        updated += Recipe.objects.bulk_update(
+            batch, ['popularity', 'popularity_updated_at']
+        )
+    return updated
@@ -0,0 +1,149 @@
+import re
+from collections import defaultdict
+
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector)
+from django.db import connection, transaction
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .models import IngredientRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+FTS_TABLE = 'foodgram_recipe_fts'
+MAX_RESULTS = 1000
+BATCH_SIZE = 500
+WORD_RE = re.compile(r'\w+')
+
+
+def build_search_vector():
+    """
+    Поисковый документ: название (вес A), ингредиенты (B) и описание (C).
+    """
+    ingredient_names = Subquery(
+        IngredientRecipe.objects.filter(recipe=OuterRef('pk')).order_by(
+        ).values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(ingredient_names, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def get_documents(recipe_ids=None):
+    recipes = Recipe.objects.order_by()
+    ingredients = IngredientRecipe.objects.order_by()
+    if recipe_ids is not None:
+        recipes = recipes.filter(id__in=recipe_ids)
+        ingredients = ingredients.filter(recipe_id__in=recipe_ids)
+    names = defaultdict(list)
+    for recipe_id, name in ingredients.values_list(
+        'recipe_id', 'ingredient__name'
+    ).iterator():
+        names[recipe_id].append(name)
+    for recipe_id, name, text in recipes.values_list(
+        'id', 'name', 'text'
+    ).iterator():
+        yield recipe_id, name, ' '.join(names[recipe_id]), text
+
+
+def update_search_index(recipe_ids=None):
+    """
+    Обновляет поисковые документы рецептов recipe_ids или всех рецептов.
+    В PostgreSQL это столбец search_vector с GIN-индексом,
+    в SQLite — таблица FTS5.
+    """
+    if recipe_ids is not None:
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+        if len(recipe_ids) > BATCH_SIZE:
+            for start in range(0, len(recipe_ids), BATCH_SIZE):
+                update_search_index(recipe_ids[start:start + BATCH_SIZE])
+            return
+    if connection.vendor == 'postgresql':
+        recipes = Recipe.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(id__in=recipe_ids)
+        recipes.update(search_vector=build_search_vector())
+    elif connection.vendor == 'sqlite':
+        remove_from_search_index(recipe_ids)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, name, ingredients, text) '
+                'VALUES (%s, %s, %s, %s)',
+                list(get_documents(recipe_ids))
+            )
+
+
+def remove_from_search_index(recipe_ids=None):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        if recipe_ids is None:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            return
+        recipe_ids = list(recipe_ids)
+        if recipe_ids:
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            cursor.execute(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})',
+                recipe_ids
+            )
+
+
+def flush_search_index():
+    pending = getattr(connection, 'search_index_pending', None)
+    if not pending:
+        return
+    connection.search_index_pending = None
+    update_search_index(sorted(pending))
+
+
+def schedule_search_update(recipe_ids):
+    """
+    Обновляет поисковые документы рецептов recipe_ids после фиксации
+    транзакции, один раз на все изменения транзакции. Документы
+    удалённых рецептов при этом удаляются.
+    """
+    pending = getattr(connection, 'search_index_pending', None)
+    if pending is None:
+        pending = connection.search_index_pending = set()
+    pending.update(recipe_ids)
+    transaction.on_commit(flush_search_index)
+
+
+def search_recipes(query, limit=MAX_RESULTS):
+    """
+    Возвращает id рецептов, подходящих под запрос, от самых релевантных.
+    """
+    if connection.vendor == 'postgresql':
+        search_query = SearchQuery(
+            query, search_type='websearch', config=SEARCH_CONFIG
+        )
+        return list(Recipe.objects.filter(
+            search_vector=search_query
+        ).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date').values_list('id', flat=True)[:limit])
+    words = WORD_RE.findall(query)
+    if not words:
+        return []
+    if connection.vendor == 'sqlite':
+        match = ' '.join(f'"{word}"*' for word in words)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY bm25({FTS_TABLE}, 10.0, 5.0, 1.0) LIMIT %s',
+                [match, limit]
+            )
+            return [row[0] for row in cursor.fetchall()]
+    condition = Q()
+    for word in words:
+        condition &= Q(name__icontains=word) | Q(text__icontains=word)
+    return list(
+        Recipe.objects.filter(condition).values_list('id', flat=True)[:limit]
+    )
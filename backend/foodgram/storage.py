@@ -0,0 +1,73 @@
+import fcntl
+import hashlib
+import os
+from contextlib import contextmanager
+
+from django.core.files.storage import FileSystemStorage
+
+SCALED_SUFFIX = '_scaled'
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Хранит файлы под именем SHA-256 их содержимого: повторная загрузка
+    того же файла не создаёт копию, а возвращает имя существующего.
+    Уменьшенная копия хранится под именем оригинала с суффиксом
+    SCALED_SUFFIX, поэтому повторная загрузка оригинала сразу получает её.
+    """
+
+    @staticmethod
+    def content_name(name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(os.path.dirname(name), digest.hexdigest() + ext)
+
+    @staticmethod
+    def scaled_name(name):
+        stem, ext = os.path.splitext(name)
+        return f'{stem}{SCALED_SUFFIX}{ext}'
+
+    @contextmanager
+    def lock(self):
+        """
+        Блокировка между процессами и потоками: переиспользование
+        существующего файла и его удаление не выполняются одновременно.
+        """
+        os.makedirs(self.location, exist_ok=True)
+        with open(os.path.join(self.location, '.storage.lock'), 'w') as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def reuse(self, name):
+        # Свежее mtime защищает повторно использованный файл от удаления
+        # release_image и collect_media_garbage, пока ссылающийся на него
+        # рецепт ещё не сохранён.
+        if not self.exists(name):
+            return False
+        os.utime(self.path(name))
+        return True
+
+    def _save(self, name, content):
+        name = self.content_name(name, content)
+        with self.lock():
+            for existing in (self.scaled_name(name), name):
+                if self.reuse(existing):
+                    return existing
+            return super()._save(name, content)
+
+    def save_scaled(self, name, content):
+        """
+        Сохраняет уменьшенную копию файла name и возвращает её имя.
+        """
+        scaled = self.scaled_name(name)
+        with self.lock():
+            if self.reuse(scaled):
+                return scaled
+            return super()._save(scaled, content)